@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import get_db
+from app.core.security import require_roles
+from app.models.AuditAction import AuditAction
+from app.schemas.audit import AuditLogPage
+from app.services import audit_service
+
+router = APIRouter(tags=['Audit'])
+
+@router.get('/', response_model=AuditLogPage)
+async def list_audit_logs(
+    user_id: Optional[int] = None,
+    action_type: Optional[AuditAction] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    ip: Optional[str] = Query(default=None, description="Exact address or CIDR block"),
+    metadata_key: Optional[List[str]] = Query(default=None, description="Metadata must contain every given key"),
+    metadata: Optional[str] = Query(default=None, description="JSON object the metadata must contain"),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    _admin = Depends(require_roles('admin')),
+):
+    contains = None
+    if metadata is not None:
+        try:
+            contains = json.loads(metadata)
+        except ValueError:
+            contains = None
+        if not isinstance(contains, dict):
+            raise HTTPException(400, 'metadata must be a JSON object')
+
+    try:
+        items, next_cursor = await audit_service.query_logs(
+            db,
+            user_id=user_id,
+            action_type=action_type,
+            since=since,
+            until=until,
+            ip_address=ip,
+            metadata_keys=metadata_key,
+            metadata_contains=contains,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as exc:
+        raise HTTPException(400, str(exc))
+
+    return {'items': items, 'next_cursor': next_cursor}
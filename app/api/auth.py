@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Request, status, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Request, status, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.schemas.user import UserCreate, UserRead
@@ -9,8 +9,8 @@ from app.schemas.token import RefreshTokenRequest, RefreshTokenResponse
 from app.schemas.password import PasswordResetRequest, PasswordResetConfirm
 from app.schemas.email import EmailVerificationRequest, EmailVerificationConfirm
 from app.models.AuditAction import AuditAction
-from app.db.database import get_db
-from app.services import auth_service, email_service, audit_service, token_service, session_service, user_service
+from app.db.database import get_db, async_session
+from app.services import auth_service, email_service, audit_service, token_service, user_service, role_service, session_service
 from app.core.security import get_current_user
 
 router = APIRouter(tags = ['Auth'])
@@ -24,7 +24,7 @@ async def register_user(data: UserCreate, db: AsyncSession = Depends(get_db)):
     
     raw_token = await auth_service.create_email_verification_token(db, user)
 
-    await email_service.send_verification_email(user, raw_token)
+    await email_service.send_verification_email(db, user, raw_token)
     await audit_service.log_action(
         db,
         user_id=user.id,
@@ -37,7 +37,7 @@ async def register_user(data: UserCreate, db: AsyncSession = Depends(get_db)):
     return user
 
 @router.post('/login', response_model=LoginResponse)
-async def login(req: Request, data: LoginRequest, db: AsyncSession = Depends(get_db)):
+async def login(req: Request, data: LoginRequest, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
     client_ip = req.client.host
     user_agent = req.headers.get('user-agent')
 
@@ -55,26 +55,33 @@ async def login(req: Request, data: LoginRequest, db: AsyncSession = Depends(get
 
         await db.commit()
         raise HTTPException(status_code=400, detail='Invalid email or password')
-    
-    access_token = token_service.create_access_token_for_user(user)
-    refresh_token_str, refresh_obj  = await token_service.create_refresh_token(db, user, user_agent=user_agent, ip_addr=client_ip)
 
-    session = await session_service.create_session(
-        db, user, refresh_obj, device_token=user_agent
+    if auth_service.password_needs_rehash(user.password_hash): #type: ignore
+        background_tasks.add_task(
+            auth_service.rehash_password, async_session, user.id, data.password, user.password_hash
+        )
+    
+    access = await role_service.resolve_user_access(db, user.id, user.token_version)
+    issued = await token_service.create_refresh_token_with_session(
+        db, user, user_agent=user_agent, ip_addr=client_ip, device_info=user_agent
+    )
+    evicted = await session_service.evict_excess_sessions(db, user.id)
+    access_token = token_service.create_access_token_for_user(
+        user, extra_claims={"sid": issued.session_id}, access=access
     )
 
     await audit_service.log_action(
         db,
         user_id=user.id,
         action_type=AuditAction.LOGIN_SUCCESS,
-        metadata={"session_id": session.id, "ip": client_ip}
+        metadata={"session_id": issued.session_id, "ip": client_ip, "evicted_sessions": evicted}
     )
 
     await db.commit()
 
     return LoginResponse(
         access_token=access_token,
-        refresh_token=refresh_token_str
+        refresh_token=issued.token
     )
 
 @router.post("/refresh", response_model=RefreshTokenResponse)
@@ -87,24 +94,29 @@ async def refresh_token(
     user_agent = req.headers.get("user-agent")
 
     try:
-        new_refresh_str, new_refresh_obj = await token_service.rotate_refresh_token(
+        rotated = await token_service.rotate_refresh_token(
             db, data.refresh_token, user_agent=user_agent, ip_addr=client_ip
         )
 
+    except token_service.RefreshTokenReused:
+        # Keep the revocation of every session even though this request fails.
+        await db.commit()
+        raise HTTPException(status_code=400, detail="Invalid refresh token")
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid refresh token")
     
-    user = await db.get(new_refresh_obj.__class__.user.property.mapper.class_, new_refresh_obj.user_id)
-    access_token = token_service.create_access_token_for_user(user)
-
+    user = rotated.user
+    access = await role_service.resolve_user_access(db, user.id, user.token_version)
+    extra_claims = {"sid": rotated.session_id} if rotated.session_id is not None else None
+    access_token = token_service.create_access_token_for_user(user, extra_claims=extra_claims, access=access)
 
     await audit_service.log_action(
         db, user_id=user.id, action_type=AuditAction.TOKEN_REFRESHED,
-        metadata={"new_refresh_id": new_refresh_obj.id}
+        metadata={"new_refresh_id": rotated.refresh_token_id}
     )
 
     await db.commit()
-    return RefreshTokenResponse(access_token=access_token, refresh_token=new_refresh_str)
+    return RefreshTokenResponse(access_token=access_token, refresh_token=rotated.token)
 
 @router.post('/logout')
 async def logout(
@@ -129,12 +141,13 @@ async def logout_all(
     db: AsyncSession = Depends(get_db),
     curr_user = Depends(get_current_user)
 ):
-    await token_service.revoke_all_refresh_tokens_for_user(db, curr_user.id)
+    revoked = await token_service.revoke_all_refresh_tokens_for_user(db, curr_user.id)
 
     await audit_service.log_action(
         db,
         user_id=curr_user.id,
         action_type=AuditAction.LOGOUT_ALL_SESSIONS,
+        metadata={"sessions": revoked.sessions, "refresh_tokens": revoked.refresh_tokens},
     )
 
     await db.commit()
@@ -151,7 +164,7 @@ async def request_verification(
         return {"message": "If account exists, email will be sent"}
 
     raw = await auth_service.create_email_verification_token(db, user)
-    await email_service.send_verification_email(user, raw)
+    await email_service.send_verification_email(db, user, raw)
     await db.commit()
     return {"message": "Verification email sent"}
 
@@ -179,7 +192,7 @@ async def request_password_reset(
         return {"message": "If an account exists, a reset email has been sent"}
 
     raw = await auth_service.create_password_reset_token(db, user)
-    await email_service.send_password_reset_email(user, raw)
+    await email_service.send_password_reset_email(db, user, raw)
     await db.commit()
 
     return {"message": "If an account exists, a reset email has been sent"}
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends
+
+from app.core.hashing import hashing_pool
+from app.core.security import require_roles
+from app.services import auth_service, token_service
+from app.services.session_service import session_activity
+
+router = APIRouter(tags=['Diagnostics'])
+
+@router.get('/hashing')
+async def hashing_diagnostics(_admin = Depends(require_roles('admin'))):
+    return {
+        'bcrypt': auth_service.hashing_profile,
+        'pool': hashing_pool.stats(),
+    }
+
+@router.get('/tokens')
+async def token_diagnostics(_admin = Depends(require_roles('admin'))):
+    return {
+        'verified_token_cache': token_service.verified_token_cache_stats(),
+    }
+
+@router.get('/sessions')
+async def session_diagnostics(_admin = Depends(require_roles('admin'))):
+    return {
+        'activity': session_activity.stats(),
+    }
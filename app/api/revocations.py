@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Security, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.database import get_db
+from app.services import revocation_feed
+
+router = APIRouter(tags=['Revocations'])
+
+feed_bearer = HTTPBearer(auto_error=False)
+
+def _require_feed_token(credentials: Optional[HTTPAuthorizationCredentials] = Security(feed_bearer)) -> None:
+    expected = settings.REVOCATION_FEED_TOKEN
+    if not expected:
+        if settings.REVOCATION_FEED_PUBLIC:
+            return
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Revocation feed is not configured',
+        )
+    if credentials is None or not secrets.compare_digest(credentials.credentials, expected):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Invalid feed token',
+            headers={'WWW-Authenticate': 'Bearer'},
+        )
+
+@router.get('/')
+async def revocation_feed_page(
+    cursor: Optional[str] = None,
+    limit: int = Query(default=1000, ge=1),
+    db: AsyncSession = Depends(get_db),
+    _auth = Depends(_require_feed_token),
+):
+    """
+    Revoked access tokens after `cursor` as `[jti, exp]` pairs. Keep calling
+    with `next_cursor` while `has_more` is true, then poll.
+    """
+    try:
+        page = await revocation_feed.read_feed(db, cursor, min(limit, settings.REVOCATION_FEED_MAX_PAGE))
+    except ValueError as exc:
+        raise HTTPException(400, str(exc))
+
+    return {'items': page.items, 'next_cursor': page.next_cursor, 'has_more': page.has_more}
@@ -19,7 +19,6 @@ async def create_role(
 ):
     try:
         role = await role_service.create_role(db, data)
-        await db.commit()
 
         await audit_service.log_action(
             db, 
@@ -63,7 +62,6 @@ async def delete_role(
     ok = await role_service.delete_role(db, role_id)
     if not ok:
         raise HTTPException(404, "Role not found")
-    await db.commit()
 
     await audit_service.log_action(
         db,
@@ -92,7 +90,6 @@ async def assign_role(
         raise HTTPException(404, "User not found")
 
     await role_service.assign_role_to_user(db, user, role)
-    await db.commit()
 
     await audit_service.log_action(
         db,
@@ -120,7 +117,6 @@ async def remove_role(
         raise HTTPException(404, "User not found")
 
     await role_service.remove_role_from_user(db, user, role)
-    await db.commit()
 
     await audit_service.log_action(
         db,
@@ -140,7 +136,6 @@ async def create_permission(
 ):
     try:
         perm = await role_service.create_permission(db, data)
-        await db.commit()
 
         await audit_service.log_action(
             db,
@@ -182,7 +177,6 @@ async def assign_permission(
         raise HTTPException(404, "Permission not found")
 
     await role_service.assign_permission_to_role(db, role, perm)
-    await db.commit()
 
     await audit_service.log_action(
         db,
@@ -211,7 +205,6 @@ async def remove_permission(
         raise HTTPException(404, "Permission not found")
 
     await role_service.remove_permission_from_role(db, role, perm)
-    await db.commit()
 
     await audit_service.log_action(
         db,
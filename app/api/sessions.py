@@ -8,6 +8,7 @@ from app.core.security import get_current_user, require_roles
 from app.schemas.session import SessionRead
 from app.models.AuditAction import AuditAction
 from app.services import session_service, audit_service
+from app.services.session_service import SessionRevocation
 
 router = APIRouter(tags=['Sessions'])
 
@@ -22,18 +23,13 @@ async def revoke_my_session(
     db: AsyncSession = Depends(get_db),
     curr_user = Depends(get_current_user)
 ):
-    sessions = await session_service.get_user_sessions(db, curr_user.id)
-    session_ids = {s.id for s in sessions}
+    outcome = await session_service.revoke_session(db, session_id, owner_id=curr_user.id)
 
-    if session_id not in session_ids:
+    if outcome is SessionRevocation.FORBIDDEN:
         raise HTTPException(403, "You cannot revoke another user's session")
-    
-    ok = await session_service.revoke_session(db, session_id)
-    if not ok:
+    if outcome is SessionRevocation.NOT_FOUND:
         raise HTTPException(404, 'Session not found')
     
-    await db.commit()
-
     await audit_service.log_action(
         db,
         curr_user.id,
@@ -50,14 +46,13 @@ async def revoke_all_my_sessions(
     db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
-    await session_service.revoke_all_sessions(db, current_user.id)
-    await db.commit()
+    revoked = await session_service.revoke_all_sessions(db, current_user.id)
 
     await audit_service.log_action(
         db,
         user_id=current_user.id,
         action_type=AuditAction.ALL_SESSIONS_REVOKED,
-        metadata={"user_id": current_user.id},
+        metadata={"user_id": current_user.id, "sessions": revoked.sessions},
     )
     await db.commit()
 
@@ -77,10 +72,9 @@ async def list_all_sessions(
 
 @router.post('/{session_id}/force-revoke')
 async def force_revoke_session(session_id:int, db: AsyncSession = Depends(get_db), admin = Depends(require_roles('admin'))):
-    ok = await session_service.revoke_session(db, session_id)
-    if not ok:
+    outcome = await session_service.revoke_session(db, session_id)
+    if outcome is SessionRevocation.NOT_FOUND:
         raise HTTPException(404, 'Session not found')
-    await db.commit()
 
     await audit_service.log_action(
         db,
@@ -25,7 +25,6 @@ async def update_me(
     curr_user = Depends(get_current_active_user)
 ):
     updated_user =  await user_service.update_user(db, curr_user, data)
-    await db.commit()
 
     await audit_service.log_action(
         db,
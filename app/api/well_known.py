@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import json
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Request, Response
+
+from app.core.config import settings
+from app.core.keys import key_manager
+
+router = APIRouter(tags=['Well-known'])
+
+
+def _cache_control() -> str:
+    return f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}, must-revalidate"
+
+
+@router.get('/jwks.json')
+async def jwks(request: Request):
+    doc = key_manager.jwks()
+    headers = {'ETag': doc.etag, 'Cache-Control': _cache_control()}
+
+    if doc.etag in request.headers.get('if-none-match', ''):
+        return Response(status_code=304, headers=headers)
+    return Response(content=doc.body, media_type='application/json', headers=headers)
+
+
+_discovery: Optional[Tuple[str, bytes]] = None
+
+
+def _discovery_document() -> bytes:
+    # Rebuilt only when the key set (and so the advertised algorithms) changes.
+    global _discovery
+    etag = key_manager.jwks().etag
+    if _discovery is not None and _discovery[0] == etag:
+        return _discovery[1]
+
+    issuer = settings.jwt_issuer
+    body = json.dumps({
+        'issuer': issuer,
+        'jwks_uri': f"{issuer}/.well-known/jwks.json",
+        'token_endpoint': f"{issuer}/auth/login",
+        'refresh_endpoint': f"{issuer}/auth/refresh",
+        'revocation_endpoint': f"{issuer}/auth/logout",
+        'userinfo_endpoint': f"{issuer}/users/me",
+        'grant_types_supported': ['password', 'refresh_token'],
+        'token_endpoint_auth_methods_supported': ['none'],
+        'id_token_signing_alg_values_supported': sorted({k.algorithm for k in key_manager.ring().keys.values()}),
+        'claims_supported': ['iss', 'sub', 'email', 'iat', 'exp', 'jti', 'token_version', 'roles', 'perms'],
+    }, separators=(',', ':')).encode('utf-8')
+    _discovery = (etag, body)
+    return body
+
+
+@router.get('/openid-configuration')
+async def openid_configuration():
+    return Response(
+        content=_discovery_document(),
+        media_type='application/json',
+        headers={'Cache-Control': 'public, max-age=3600'},
+    )
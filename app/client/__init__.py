@@ -0,0 +1,9 @@
+"""
+Token verification for services that trust this auth service.
+
+Only depends on PyJWT, httpx and FastAPI, so it can be vendored or installed
+into other services without the rest of `app`.
+"""
+from app.client.verifier import Principal, TokenVerifier, VerificationError
+
+__all__ = ["Principal", "TokenVerifier", "VerificationError"]
@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, FrozenSet, Iterable, Optional, Sequence
+
+import httpx
+import jwt
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ALGORITHMS = ("RS256", "ES256", "EdDSA")
+
+
+class VerificationError(Exception):
+    """The token is malformed, badly signed, expired, revoked or from another issuer."""
+
+
+class UnknownKeyError(VerificationError):
+    """The token's `kid` is not in the cached JWKS."""
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller, taken from the verified access token alone."""
+    user_id: int
+    email: Optional[str]
+    jti: str
+    roles: FrozenSet[str]
+    claims: Dict[str, Any] = field(repr=False)
+
+
+class TokenVerifier:
+    """
+    Verifies access tokens issued by the auth service without calling it per
+    request.
+
+    Signing keys come from the service's JWKS document and are parsed once
+    per `kid`; an unknown `kid` triggers a refetch (at most every
+    `jwks_min_refresh_seconds`), so key rotation needs no coordination.
+    When `revocations_url` is set, a background task keeps a local set of
+    revoked `jti`s in sync through the incremental revocation feed, dropping
+    entries once the token they revoke has expired.
+
+        verifier = TokenVerifier("https://auth.example.com")
+        app = FastAPI(lifespan=verifier.lifespan)
+
+        @app.get("/orders")
+        async def orders(user: Principal = Depends(verifier.current_principal)): ...
+
+    Tokens minted before a role change are not rejected here (that needs the
+    user row); keep ACCESS_TOKEN_EXPIRES_MINUTES short where that matters.
+    """
+
+    def __init__(
+            self,
+            issuer: str,
+            jwks_url: Optional[str] = None,
+            revocations_url: Optional[str] = None,
+            algorithms: Sequence[str] = DEFAULT_ALGORITHMS,
+            headers: Optional[Dict[str, str]] = None,
+            jwks_min_refresh_seconds: float = 30.0,
+            jwks_max_age_seconds: float = 3600.0,
+            revocation_poll_seconds: float = 5.0,
+            revocation_max_lag_seconds: Optional[float] = None,
+            leeway: float = 0.0,
+            http_timeout: float = 5.0,
+            cookie_name: Optional[str] = "access_token",
+    ):
+        self.issuer = issuer.rstrip("/")
+        self.jwks_url = jwks_url or f"{self.issuer}/.well-known/jwks.json"
+        self.revocations_url = revocations_url
+        self.algorithms = list(algorithms)
+        self.headers = headers or {}
+        self.jwks_min_refresh_seconds = jwks_min_refresh_seconds
+        self.jwks_max_age_seconds = jwks_max_age_seconds
+        self.revocation_poll_seconds = revocation_poll_seconds
+        # Fail closed once the revocation set is older than this (None: never).
+        self.revocation_max_lag_seconds = revocation_max_lag_seconds
+        self.leeway = leeway
+        self.http_timeout = http_timeout
+        self.cookie_name = cookie_name
+
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._jwks_etag: Optional[str] = None
+        self._jwks_fetched_at = 0.0
+        self._jwks_lock = asyncio.Lock()
+
+        self._revoked: Dict[str, int] = {}
+        self._revocation_cursor: Optional[str] = None
+        self._revocations_synced_at: Optional[float] = None
+
+        self._http: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # -- keys -----------------------------------------------------------------
+
+    def load_jwks(self, document: Dict[str, Any]) -> None:
+        """Replace the key cache from a JWK Set; keys already parsed are reused."""
+        keys: Dict[str, jwt.PyJWK] = {}
+        for jwk in document.get("keys", []):
+            kid = jwk.get("kid")
+            if not kid or jwk.get("use", "sig") != "sig":
+                continue
+            existing = self._keys.get(kid)
+            if existing is not None:
+                keys[kid] = existing
+                continue
+            try:
+                keys[kid] = jwt.PyJWK(jwk)
+            except jwt.PyJWKError:
+                logger.warning("Skipping unusable JWK %s", kid)
+        self._keys = keys
+        self._jwks_fetched_at = time.monotonic()
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=self.http_timeout, headers=self.headers)
+        return self._http
+
+    async def refresh_jwks(self, force: bool = False) -> None:
+        async with self._jwks_lock:
+            age = time.monotonic() - self._jwks_fetched_at
+            if self._keys and age < (self.jwks_min_refresh_seconds if force else self.jwks_max_age_seconds):
+                return
+
+            headers = {"If-None-Match": self._jwks_etag} if self._jwks_etag and self._keys else {}
+            res = await self._client().get(self.jwks_url, headers=headers)
+            if res.status_code == 304:
+                self._jwks_fetched_at = time.monotonic()
+                return
+            res.raise_for_status()
+            self.load_jwks(res.json())
+            self._jwks_etag = res.headers.get("etag")
+
+    # -- revocations ----------------------------------------------------------
+
+    def add_revocations(self, items: Iterable[Sequence[Any]]) -> None:
+        for jti, exp in items:
+            self._revoked[jti] = int(exp)
+
+    def _prune_revocations(self) -> None:
+        now = time.time()
+        expired = [jti for jti, exp in self._revoked.items() if exp + self.leeway < now]
+        for jti in expired:
+            del self._revoked[jti]
+
+    async def sync_revocations(self) -> int:
+        """Pull every revocation after the stored cursor; returns how many were new."""
+        if not self.revocations_url:
+            return 0
+
+        added = 0
+        while True:
+            params = {"cursor": self._revocation_cursor} if self._revocation_cursor else {}
+            res = await self._client().get(self.revocations_url, params=params)
+            res.raise_for_status()
+            page = res.json()
+
+            self.add_revocations(page["items"])
+            added += len(page["items"])
+            self._revocation_cursor = page.get("next_cursor") or self._revocation_cursor
+            if not page.get("has_more"):
+                break
+
+        self._prune_revocations()
+        self._revocations_synced_at = time.monotonic()
+        return added
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    # -- verification ---------------------------------------------------------
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        """Verify against the cached keys and revocation set only; never does I/O."""
+        key = self._keys.get(_unverified_kid(token))
+        if key is None:
+            raise UnknownKeyError("Unknown signing key")
+        if key.algorithm_name not in self.algorithms:
+            raise VerificationError("Signing algorithm not allowed")
+
+        try:
+            claims = jwt.decode(
+                token,
+                key.key,
+                algorithms=[key.algorithm_name],
+                issuer=self.issuer,
+                leeway=self.leeway,
+                options={"require": ["exp", "sub", "jti"], "verify_aud": False},
+            )
+        except jwt.InvalidTokenError as exc:
+            raise VerificationError(str(exc)) from exc
+
+        if self.revocations_url:
+            if self.revocation_max_lag_seconds is not None and (
+                    self._revocations_synced_at is None
+                    or time.monotonic() - self._revocations_synced_at > self.revocation_max_lag_seconds
+            ):
+                raise VerificationError("Revocation list is stale")
+            if claims["jti"] in self._revoked:
+                raise VerificationError("Token revoked")
+
+        return claims
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Like `decode`, but fetches the JWKS first when it is missing or the kid is new."""
+        if not self._keys:
+            await self.refresh_jwks()
+        try:
+            return self.decode(token)
+        except UnknownKeyError:
+            await self.refresh_jwks(force=True)
+        return self.decode(token)
+
+    # -- lifecycle ------------------------------------------------------------
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh_jwks()
+                await self.sync_revocations()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Token verifier refresh failed")
+            await asyncio.sleep(self.revocation_poll_seconds)
+
+    async def start(self) -> None:
+        await self.refresh_jwks()
+        await self.sync_revocations()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any) -> AsyncIterator[None]:
+        await self.start()
+        try:
+            yield
+        finally:
+            await self.close()
+
+    # -- FastAPI dependencies -------------------------------------------------
+
+    async def current_principal(
+            self,
+            request: Request,
+            credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+    ) -> Principal:
+        """Drop-in for the service's `get_current_user` that needs no database."""
+        token = credentials.credentials if credentials and credentials.scheme.lower() == "bearer" else None
+        if not token and self.cookie_name:
+            token = request.cookies.get(self.cookie_name)
+        if not token:
+            raise _unauth_exc("Authorization token not provided.")
+
+        try:
+            claims = await self.verify(token)
+            user_id = int(claims["sub"])
+        except (VerificationError, ValueError, httpx.HTTPError) as exc:
+            raise _unauth_exc(str(exc) if isinstance(exc, VerificationError) else "could not validate credentials")
+
+        principal = Principal(
+            user_id=user_id,
+            email=claims.get("email"),
+            jti=claims["jti"],
+            roles=frozenset(claims.get("roles") or ()),
+            claims=claims,
+        )
+        request.state.principal = principal
+        return principal
+
+    def require_roles(self, *required_roles: str) -> Callable[..., Any]:
+        """Allow the request if the token carries any of `required_roles`."""
+
+        async def _dependency(principal: Principal = Depends(self.current_principal)) -> Principal:
+            if principal.roles.isdisjoint(required_roles):
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient role")
+            return principal
+
+        return _dependency
+
+
+def _unverified_kid(token: str) -> str:
+    # Only the header segment is decoded here; jwt.get_unverified_header
+    # would validate the whole token, which jwt.decode then does again.
+    try:
+        segment = token[:token.index(".")]
+        header = json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+        kid = header.get("kid")
+    except (ValueError, AttributeError) as exc:
+        raise VerificationError("Invalid token header") from exc
+    if not isinstance(kid, str):
+        raise UnknownKeyError("Unknown signing key")
+    return kid
+
+
+def _unauth_exc(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import AnyHttpUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -30,9 +30,96 @@ class Settings(BaseSettings):
     PUBLIC_KEY: Optional[str] = None
     PRIVATE_KEY_PATH: Optional[Path] = None
     PUBLIC_KEY_PATH: Optional[Path] = None
+    # The signing algorithm follows the private key's type: RSA -> RS256,
+    # EC P-256 -> ES256, Ed25519 -> EdDSA. Set this to fail fast when the
+    # configured key does not match the intended algorithm.
+    JWT_ALGORITHM: Optional[str] = None
+    # Public keys (*.pem) still accepted for verification after a rotation
+    JWT_RETIRED_KEYS_DIR: Optional[Path] = None
+    # How often key files are checked for changes (0 disables hot reload)
+    JWT_KEY_RELOAD_SECONDS: int = 60
+    # How long a signing key replaced at runtime still verifies tokens when
+    # it is not in JWT_RETIRED_KEYS_DIR (default: the access token lifetime)
+    JWT_PREVIOUS_KEY_GRACE_SECONDS: Optional[int] = None
+
+    # `iss` of issued tokens and of the discovery document; defaults to APP_BASE_URL
+    JWT_ISSUER: Optional[str] = None
+    # Cache-Control max-age of /.well-known/jwks.json; keep it well below the
+    # time a retired key stays in JWT_RETIRED_KEYS_DIR
+    JWKS_MAX_AGE_SECONDS: int = 300
 
     ACCESS_TOKEN_EXPIRES_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRES_DAYS: int = 30
+    # A refresh token replayed this soon after it was rotated (two tabs, a
+    # retried request) gets the successor it already produced instead of
+    # being treated as stolen. 0 disables the grace window.
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS: int = 30
+    # Peppers (id -> secret) keying the HMAC tag on refresh tokens and the
+    # successor secrets. New tokens use REFRESH_TOKEN_PEPPER_ID (default: the
+    # last entry); keep a retired pepper listed until its tokens have expired.
+    REFRESH_TOKEN_PEPPERS: Dict[str, str] = {}
+    REFRESH_TOKEN_PEPPER_ID: Optional[str] = None
+    # Single-pepper shorthand, used as pepper "0" when REFRESH_TOKEN_PEPPERS is
+    # empty. With neither set (development only; startup fails otherwise)
+    # the pepper is derived from the JWT signing key, and tokens whose key
+    # this process never held fall back to a database check.
+    REFRESH_TOKEN_SECRET: Optional[str] = None
+    # Still accept `{id}-{user_id}-{secret}` tokens issued before tagging;
+    # safe to turn off REFRESH_TOKEN_EXPIRES_DAYS after upgrading
+    REFRESH_TOKEN_ACCEPT_UNTAGGED: bool = True
+
+    # In-process revoked access token cache
+    REVOCATION_CACHE_REFRESH_SECONDS: int = 5
+    REVOCATION_CACHE_FULL_RELOAD_SECONDS: int = 600
+    REVOCATION_CACHE_CAPACITY: int = 100_000
+    # Bearer token other services present to GET /revocations. Without one
+    # the feed answers 503 unless REVOCATION_FEED_PUBLIC opts into serving
+    # it unauthenticated.
+    REVOCATION_FEED_TOKEN: Optional[str] = None
+    REVOCATION_FEED_PUBLIC: bool = False
+    REVOCATION_FEED_MAX_PAGE: int = 5000
+
+    # bcrypt worker pool
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS: float = 5.0
+
+    # bcrypt cost: fixed rounds, or calibrated at startup to hit BCRYPT_TARGET_MS
+    BCRYPT_ROUNDS: Optional[int] = None
+    BCRYPT_CALIBRATE: bool = False
+    BCRYPT_TARGET_MS: int = 250
+    BCRYPT_MIN_ROUNDS: int = 10
+    BCRYPT_MAX_ROUNDS: int = 16
+
+    # Audit log writer: these actions are batched in the background, the rest
+    # are written inside the request's transaction
+    AUDIT_ASYNC_ACTIONS: List[str] = ["login_success", "login_failed", "token_refreshed", "logout"]
+    AUDIT_QUEUE_SIZE: int = 10_000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_SECONDS: float = 1.0
+    # Monthly audit_logs partitions: how many to keep ahead, and how long to keep
+    # old ones (0 keeps them forever)
+    AUDIT_PARTITIONS_AHEAD: int = 3
+    AUDIT_RETENTION_DAYS: int = 365
+    AUDIT_PARTITION_MAINTENANCE_SECONDS: int = 3600
+
+    # Decoded payloads of recently verified access tokens, roughly 1 KiB
+    # each (0 disables)
+    VERIFIED_TOKEN_CACHE_SIZE: int = 10_000
+
+    # Live sessions a user may hold; a login beyond this revokes the least
+    # recently used ones (0: unlimited)
+    MAX_SESSIONS_PER_USER: int = 20
+
+    # Session activity: last_used_at is recorded in memory and written in
+    # batches; a stored time is only rewritten once it is this many seconds stale
+    SESSION_ACTIVITY_FLUSH_SECONDS: float = 10.0
+    SESSION_ACTIVITY_PRECISION_SECONDS: int = 60
+    SESSION_ACTIVITY_MAX_PENDING: int = 50_000
+
+    # Per-user resolved roles/permissions
+    PERMISSION_CACHE_TTL_SECONDS: int = 60
+    PERMISSION_CACHE_MAX_USERS: int = 10_000
 
     # Cookie names
     ACCESS_TOKEN_COOKIE_NAME: str = "access_token"
@@ -42,6 +129,21 @@ class Settings(BaseSettings):
     SMTP_USER: Optional[str] = None
     SMTP_PASSWORD: Optional[str] = None
     SMTP_FROM: Optional[str] = None
+    SMTP_START_TLS: bool = True
+    SMTP_USE_TLS: bool = False
+
+    # Outbox dispatcher
+    EMAIL_DISPATCHER_ENABLED: bool = True
+    EMAIL_SMTP_POOL_SIZE: int = 4
+    EMAIL_DISPATCH_BATCH_SIZE: int = 50
+    EMAIL_DISPATCH_POLL_SECONDS: float = 5.0
+    EMAIL_MAX_ATTEMPTS: int = 6
+    EMAIL_RETRY_BASE_SECONDS: float = 30.0
+    # How long a claimed row is hidden from other dispatchers while it sends
+    EMAIL_CLAIM_LEASE_SECONDS: float = 300.0
+    # Sent and dead rows are deleted this long after they finish
+    EMAIL_OUTBOX_RETENTION_DAYS: int = 7
+    EMAIL_OUTBOX_PURGE_SECONDS: float = 3600.0
 
     # CORS
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000"]
@@ -61,5 +163,9 @@ class Settings(BaseSettings):
         sslmode = (self.DB_SSLMODE or 'require').strip()
         return f"postgresql+psycopg://{user}:{pwd}@{host}:{port}/{name}?sslmode={sslmode}"
 
+    @property
+    def jwt_issuer(self) -> str:
+        return (self.JWT_ISSUER or str(self.APP_BASE_URL or "")).rstrip("/")
+
 
 settings = Settings()
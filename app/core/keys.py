@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from app.core.config import settings
+
+
+def _b64url_uint(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8 or 1, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64url_fixed(value: int, size: int) -> str:
+    return base64.urlsafe_b64encode(value.to_bytes(size, "big")).rstrip(b"=").decode("ascii")
+
+
+# EC curve -> (JWK "crv", JWS algorithm, coordinate size in bytes)
+_EC_CURVES = {
+    "secp256r1": ("P-256", "ES256", 32),
+    "secp384r1": ("P-384", "ES384", 48),
+    "secp521r1": ("P-521", "ES512", 66),
+}
+
+
+def _ec_curve(public_key: ec.EllipticCurvePublicKey) -> Tuple[str, str, int]:
+    try:
+        return _EC_CURVES[public_key.curve.name]
+    except KeyError:
+        raise ValueError(f"Unsupported EC curve: {public_key.curve.name}")
+
+
+def public_jwk_fields(public_key: Any) -> Dict[str, str]:
+    """Required JWK members for a public key (RFC 7517/7518/8037)."""
+    if isinstance(public_key, rsa.RSAPublicKey):
+        numbers = public_key.public_numbers()
+        return {"kty": "RSA", "n": _b64url_uint(numbers.n), "e": _b64url_uint(numbers.e)}
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        crv, _, size = _ec_curve(public_key)
+        numbers = public_key.public_numbers()
+        return {"kty": "EC", "crv": crv, "x": _b64url_fixed(numbers.x, size), "y": _b64url_fixed(numbers.y, size)}
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        raw = public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        return {"kty": "OKP", "crv": "Ed25519", "x": base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")}
+    raise ValueError(f"Unsupported key type: {type(public_key).__name__}")
+
+
+def key_thumbprint(public_key: Any) -> str:
+    """RFC 7638 JWK thumbprint, used as the `kid` of a key."""
+    canonical = json.dumps(public_jwk_fields(public_key), sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(canonical.encode("utf-8")).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def algorithm_for_key(public_key: Any) -> str:
+    """The JWS algorithm implied by a key: RS256, ES256/384/512 (by curve) or EdDSA."""
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RS256"
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        return _ec_curve(public_key)[1]
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return "EdDSA"
+    raise ValueError(f"Unsupported key type: {type(public_key).__name__}")
+
+
+@dataclass(frozen=True)
+class JwtKey:
+    kid: str
+    algorithm: str
+    public_key: Any
+    private_key: Optional[Any] = None
+
+
+@dataclass(frozen=True)
+class KeyRing:
+    """Immutable snapshot of the active signer plus every key accepted for verification."""
+    active: JwtKey
+    keys: Dict[str, JwtKey] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class JwksDocument:
+    """Serialized JWK Set for one KeyRing, with a content-derived ETag."""
+    body: bytes
+    etag: str
+
+
+def public_jwk(key: JwtKey) -> Dict[str, str]:
+    return {**public_jwk_fields(key.public_key), "kid": key.kid, "alg": key.algorithm, "use": "sig"}
+
+
+def build_jwks(ring: KeyRing) -> JwksDocument:
+    # Active key first, the rest in a stable order so the ETag only changes with the key set.
+    others = sorted(kid for kid in ring.keys if kid != ring.active.kid)
+    jwks = {"keys": [public_jwk(ring.active)] + [public_jwk(ring.keys[kid]) for kid in others]}
+    body = json.dumps(jwks, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return JwksDocument(body=body, etag=etag)
+
+
+def load_private_pem(pem: str | bytes) -> Any:
+    data = pem.encode("utf-8") if isinstance(pem, str) else pem
+    return serialization.load_pem_private_key(data, password=None)
+
+
+def load_public_pem(pem: str | bytes) -> Any:
+    data = pem.encode("utf-8") if isinstance(pem, str) else pem
+    return serialization.load_pem_public_key(data)
+
+
+def make_key(private_key: Any = None, public_key: Any = None, algorithm: Optional[str] = None) -> JwtKey:
+    """
+    Wrap a key pair (or a bare public key) for signing/verification. When
+    `algorithm` is given it must be the one the key type implies, so a
+    mismatched JWT_ALGORITHM fails at load instead of on every request.
+    """
+    if public_key is None:
+        if private_key is None:
+            raise ValueError("A private or public key is required")
+        public_key = private_key.public_key()
+
+    implied = algorithm_for_key(public_key)
+    if algorithm and algorithm != implied:
+        raise ValueError(f"Key {type(public_key).__name__} signs {implied}, not {algorithm}")
+
+    return JwtKey(
+        kid=key_thumbprint(public_key),
+        algorithm=implied,
+        public_key=public_key,
+        private_key=private_key,
+    )
+
+
+def _read_text(path: Optional[Path]) -> Optional[str]:
+    if path and path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    return None
+
+
+def _file_stamp(path: Optional[Path]) -> Tuple[Any, ...]:
+    if not path:
+        return ()
+    try:
+        st = path.stat()
+    except OSError:
+        return (str(path), None)
+    return (str(path), st.st_mtime_ns, st.st_size)
+
+
+class KeyManager:
+    """
+    Loads JWT key material once, keeps it as parsed `cryptography` key objects
+    and indexes it by `kid`.
+
+    The active private key comes from PRIVATE_KEY / PRIVATE_KEY_PATH; every
+    `*.pem` public key in JWT_RETIRED_KEYS_DIR stays valid for verification.
+    When the key files change on disk the ring is rebuilt and swapped in
+    atomically, so keys can be rotated without restarting workers:
+
+        1. copy the current public key into JWT_RETIRED_KEYS_DIR
+        2. replace PRIVATE_KEY_PATH / PUBLIC_KEY_PATH with the new pair
+
+    The active key replaced at runtime stays a verifier for
+    JWT_PREVIOUS_KEY_GRACE_SECONDS, so tokens signed just before a rotation
+    keep working; after that only the keys currently on disk are trusted.
+    """
+
+    def __init__(self, reload_seconds: Optional[float] = None, grace_seconds: Optional[float] = None):
+        self._ring: Optional[KeyRing] = None
+        # What the settings (or `rotate`) provide, before previous keys are added back
+        self._source: Optional[KeyRing] = None
+        # kid -> (verifier, monotonic deadline) for keys that were active earlier
+        self._previous: Dict[str, Tuple[JwtKey, float]] = {}
+        self._next_expiry = math.inf
+        self._lock = threading.Lock()
+        self._reload_seconds = (
+            settings.JWT_KEY_RELOAD_SECONDS if reload_seconds is None else reload_seconds
+        )
+        if grace_seconds is None:
+            grace_seconds = settings.JWT_PREVIOUS_KEY_GRACE_SECONDS
+        self._grace_seconds = (
+            settings.ACCESS_TOKEN_EXPIRES_MINUTES * 60 if grace_seconds is None else grace_seconds
+        )
+        self._stamp: Tuple[Any, ...] = ()
+        self._next_check = 0.0
+        self._last_forced = 0.0
+        self._jwks: Optional[Tuple[KeyRing, JwksDocument]] = None
+
+    def _source_stamp(self) -> Tuple[Any, ...]:
+        stamp: List[Any] = [_file_stamp(settings.PRIVATE_KEY_PATH), _file_stamp(settings.PUBLIC_KEY_PATH)]
+        retired_dir = settings.JWT_RETIRED_KEYS_DIR
+        if retired_dir and retired_dir.is_dir():
+            stamp.extend(_file_stamp(p) for p in sorted(retired_dir.glob("*.pem")))
+        return tuple(stamp)
+
+    def _load_from_settings(self) -> KeyRing:
+        private_pem = settings.PRIVATE_KEY or _read_text(settings.PRIVATE_KEY_PATH)
+        if not private_pem:
+            raise RuntimeError("PRIVATE_KEY or PRIVATE_KEY_PATH must be set in settings")
+
+        public_pem = settings.PUBLIC_KEY or _read_text(settings.PUBLIC_KEY_PATH)
+        private_key = load_private_pem(private_pem)
+        public_key = load_public_pem(public_pem) if public_pem else None
+        active = make_key(private_key, public_key, settings.JWT_ALGORITHM)
+
+        keys: Dict[str, JwtKey] = {}
+        retired_dir = settings.JWT_RETIRED_KEYS_DIR
+        if retired_dir and retired_dir.is_dir():
+            for path in sorted(retired_dir.glob("*.pem")):
+                verifier = make_key(public_key=load_public_pem(path.read_bytes()))
+                keys[verifier.kid] = verifier
+
+        keys[active.kid] = active
+        return KeyRing(active=active, keys=keys)
+
+    def _swap(self, source: KeyRing) -> None:
+        """Install `source` plus the previous active keys still inside their grace. Caller holds the lock."""
+        now = time.monotonic()
+        current = self._ring
+        if current is not None and current.active.kid != source.active.kid and self._grace_seconds > 0:
+            old = current.active
+            self._previous[old.kid] = (JwtKey(old.kid, old.algorithm, old.public_key), now + self._grace_seconds)
+
+        self._previous = {
+            kid: entry for kid, entry in self._previous.items()
+            if entry[1] > now and kid != source.active.kid
+        }
+        self._next_expiry = min((deadline for _, deadline in self._previous.values()), default=math.inf)
+
+        keys = {kid: key for kid, (key, _) in self._previous.items()}
+        keys.update(source.keys)
+        self._source = source
+        self._ring = KeyRing(active=source.active, keys=keys)
+
+    def _refresh(self, force: bool = False) -> KeyRing:
+        now = time.monotonic()
+        with self._lock:
+            if self._ring is None:
+                self._stamp = self._source_stamp()
+                self._swap(self._load_from_settings())
+            elif force or (self._reload_seconds > 0 and now >= self._next_check):
+                stamp = self._source_stamp()
+                if stamp != self._stamp:
+                    self._stamp = stamp
+                    self._swap(self._load_from_settings())
+            if now >= self._next_expiry:
+                self._swap(self._source)  # type: ignore[arg-type]
+            self._next_check = now + self._reload_seconds
+            return self._ring  # type: ignore[return-value]
+
+    def ring(self) -> KeyRing:
+        ring = self._ring
+        now = time.monotonic()
+        if ring is None or (self._reload_seconds > 0 and now >= self._next_check) or now >= self._next_expiry:
+            ring = self._refresh()
+        return ring
+
+    def signing_key(self) -> JwtKey:
+        return self.ring().active
+
+    def verification_key(self, kid: Optional[str]) -> Optional[JwtKey]:
+        ring = self.ring()
+        if kid is None:
+            # Tokens issued before `kid` was stamped were signed with the active key.
+            return ring.active
+
+        key = ring.keys.get(kid)
+        if key is None:
+            # Another worker may already have picked up a rotated key.
+            with self._lock:
+                now = time.monotonic()
+                force = now - self._last_forced >= 1.0
+                if force:
+                    self._last_forced = now
+            if force:
+                key = self._refresh(force=True).keys.get(kid)
+        return key
+
+    def jwks(self) -> JwksDocument:
+        """JWK Set of every verification key, rebuilt only when the ring changes."""
+        ring = self.ring()
+        cached = self._jwks
+        if cached is None or cached[0] is not ring:
+            cached = (ring, build_jwks(ring))
+            self._jwks = cached
+        return cached[1]
+
+    def rotate(self, private_key: Any, public_key: Any = None, algorithm: Optional[str] = None) -> JwtKey:
+        """Make `private_key` the active signer; the previous signer stays a verifier for the grace period."""
+        new_key = make_key(private_key, public_key, algorithm)
+        with self._lock:
+            source = self._source
+            keys = {}
+            if source is not None:
+                keys = {kid: k for kid, k in source.keys.items() if kid != source.active.kid}
+            keys[new_key.kid] = new_key
+            self._swap(KeyRing(active=new_key, keys=keys))
+        return new_key
+
+    def retire(self, kid: str) -> bool:
+        """Stop accepting tokens signed with `kid`. The active key cannot be retired."""
+        with self._lock:
+            ring, source = self._ring, self._source
+            if ring is None or source is None or kid not in ring.keys or ring.active.kid == kid:
+                return False
+            self._previous.pop(kid, None)
+            self._swap(KeyRing(active=source.active, keys={k: v for k, v in source.keys.items() if k != kid}))
+        return True
+
+
+key_manager = KeyManager()
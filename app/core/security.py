@@ -10,9 +10,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.User import User
 from app.core.config import settings
-from app.services import token_service, role_service
+from app.services import token_service, role_service, session_service
 from app.db.database import get_db
-from app.services.role_service import get_user_permissions, get_user_roles
+from app.services.role_service import decode_permission_mask, get_permission_mask, resolve_user_access
 
 bearer_scheme = HTTPBearer(auto_error = False)
 
@@ -50,15 +50,18 @@ def verify_access_token(token: str) -> dict:
         raise _unauth_exc()
     return payload
 
-async def get_current_user(
+async def get_token_payload(
         token: Optional[str] = Depends(get_token_from_header_or_cookie),
-        db: AsyncSession = Depends(get_db),
-) -> User:
+) -> dict:
     if not token:
         raise _unauth_exc("Authorization token not provided.")
-    
-    payload = verify_access_token(token)
 
+    return verify_access_token(token)
+
+async def get_current_user(
+        payload: dict = Depends(get_token_payload),
+        db: AsyncSession = Depends(get_db),
+) -> User:
     sub = payload.get('sub')
     jti = payload.get('jti')
 
@@ -81,6 +84,16 @@ async def get_current_user(
     user = await db.get(User, user_id)
     if not user:
         raise _unauth_exc("User not found")
+
+    token_version = payload.get('token_version')
+    if token_version is not None and token_version != user.token_version:
+        raise _unauth_exc("Token is stale")
+
+    # Tokens from login/refresh name their session; this is an in-memory
+    # note, written in batches by session_activity.
+    sid = payload.get('sid')
+    if isinstance(sid, int):
+        session_service.touch_session(sid)
     
     return user
 
@@ -98,15 +111,43 @@ def require_roles(*required_roles: str) -> Callable[..., None]:
 
     async def _dependency(
             current_user: User = Depends(get_current_user),
+            payload: dict = Depends(get_token_payload),
             db : AsyncSession = Depends(get_db),
     ):
-        roles = await get_user_roles(db, current_user.id) #type: ignore
-        role_names = {r.name for r in roles}
+        # get_current_user has already rejected tokens minted before the
+        # last role change, so the embedded roles can be trusted as-is.
+        roles = payload.get('roles')
+        if roles is None:
+            access = await resolve_user_access(db, current_user.id, current_user.token_version) #type: ignore
+            roles = access.roles
 
         for r in required_roles:
-            if r in role_names:
+            if r in roles:
                 return current_user
         
         raise _forbidden_exc("Insufficient role")
     
-    return _dependency
\ No newline at end of file
+    return _dependency
+
+def require_permissions(*required_permissions: str) -> Callable[..., None]:
+    """Allow the request only if the user holds every one of `required_permissions`."""
+
+    async def _dependency(
+            current_user: User = Depends(get_current_user),
+            payload: dict = Depends(get_token_payload),
+            db : AsyncSession = Depends(get_db),
+    ):
+        encoded = payload.get('perms')
+        if encoded is None:
+            access = await resolve_user_access(db, current_user.id, current_user.token_version) #type: ignore
+            allowed = access.permissions.issuperset(required_permissions)
+        else:
+            required = await get_permission_mask(db, required_permissions)
+            allowed = required is not None and decode_permission_mask(encoded) & required == required
+
+        if not allowed:
+            raise _forbidden_exc("Insufficient permissions")
+
+        return current_user
+
+    return _dependency
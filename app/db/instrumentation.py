@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_current: ContextVar[Optional["StatementCounter"]] = ContextVar("statement_counter", default=None)
+_installed = False
+
+
+class StatementCounter:
+    """Statements (and commits) sent to the database inside a `count_statements()` block."""
+
+    def __init__(self) -> None:
+        self.statements: List[str] = []
+        # Bound parameters of each statement; the first set for executemany
+        # batches, which all share one plan
+        self.parameters: List[Any] = []
+        self.commits = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def round_trips(self) -> int:
+        return len(self.statements) + self.commits
+
+    def __repr__(self) -> str:
+        return f"StatementCounter(statements={self.count}, commits={self.commits})"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = _current.get()
+    if counter is not None:
+        counter.statements.append(statement)
+        counter.parameters.append(parameters[0] if executemany and parameters else parameters)
+
+
+def _on_commit(conn) -> None:
+    counter = _current.get()
+    if counter is not None:
+        counter.commits += 1
+
+
+def _install() -> None:
+    global _installed
+    if not _installed:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "commit", _on_commit)
+        _installed = True
+
+
+@contextmanager
+def count_statements() -> Iterator[StatementCounter]:
+    """
+    Count what the current task sends to the database, across every engine:
+
+        with count_statements() as counter:
+            await token_service.rotate_refresh_token(db, token)
+        assert counter.count <= 1
+
+    Counting follows the asyncio task (SQLAlchemy's async greenlets share
+    its context), so concurrent requests do not bleed into each other.
+    """
+    _install()
+    counter = StatementCounter()
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
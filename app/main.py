@@ -1,18 +1,65 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.api.auth import router as auth_router
 from app.api.users import router as users_router
 from app.api.sessions import router as sessions_router
 from app.api.roles import router as roles_router
+from app.api.diagnostics import router as diagnostics_router
+from app.api.audit import router as audit_router
+from app.api.well_known import router as well_known_router
+from app.api.revocations import router as revocations_router
 
 
 from dotenv import load_dotenv
 load_dotenv()
 
 from app.core.config import settings
+from app.core.hashing import HashingPoolBusy, hashing_pool
+from app.db.database import async_session
+from app.services.revocation_cache import revocation_cache
+from app.services import auth_service, audit_partition_service
+from app.services.audit_service import audit_writer
+from app.services.session_service import session_activity
+from app.services.email_dispatcher import email_dispatcher, smtp_configured
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await hashing_pool.run(auth_service.configure_password_hashing)
+
+    tasks = [
+        asyncio.create_task(revocation_cache.run(async_session)),
+        asyncio.create_task(audit_writer.run(async_session)),
+        asyncio.create_task(audit_partition_service.run(async_session)),
+        asyncio.create_task(session_activity.run(async_session)),
+    ]
+
+    if settings.EMAIL_DISPATCHER_ENABLED:
+        if smtp_configured():
+            tasks.append(asyncio.create_task(email_dispatcher.run(async_session)))
+        else:
+            logger.warning("SMTP_HOST / SMTP_FROM not set; queued emails will not be delivered")
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        hashing_pool.shutdown()
+
 
 app = FastAPI(
-    title=settings.APP_NAME
+    title=settings.APP_NAME,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -28,6 +75,18 @@ app.include_router(auth_router, prefix="/auth")
 app.include_router(users_router, prefix="/users")
 app.include_router(roles_router, prefix="/roles")
 app.include_router(sessions_router, prefix="/sessions")
+app.include_router(diagnostics_router, prefix="/diagnostics")
+app.include_router(audit_router, prefix="/audit")
+app.include_router(revocations_router, prefix="/revocations")
+app.include_router(well_known_router, prefix="/.well-known")
+
+@app.exception_handler(HashingPoolBusy)
+async def hashing_pool_busy_handler(request: Request, exc: HashingPoolBusy):
+    return JSONResponse(
+        status_code=503,
+        content={'detail': 'Server busy, please retry'},
+        headers={'Retry-After': '1'},
+    )
 
 @app.get('/')
 def root():
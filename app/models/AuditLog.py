@@ -1,18 +1,34 @@
-from sqlalchemy import BigInteger, Column, DateTime, Text, ForeignKey, Enum, func
+from sqlalchemy import BigInteger, Column, DateTime, Text, ForeignKey, Enum, Index, func, text
 from app.db.base import Base
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSONB, INET
 from .AuditAction import AuditAction
 
+# Range-partitioned by month on created_at (partitions are managed by
+# app.services.audit_partition_service), so created_at is part of the key.
 class AuditLog(Base):
     __tablename__ = "audit_logs"
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
     user_id = Column(BigInteger, ForeignKey("users.id"))
     action_type = Column(Enum(AuditAction, name= "audit_action_enum"), nullable=False)
     metadata_ = Column("metadata", JSONB)
     ip_address = Column(INET)
     user_agent = Column(Text)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
 
-    user = relationship("User", back_populates="audit_logs")
\ No newline at end of file
+    user = relationship("User", back_populates="audit_logs")
+
+    __table_args__ = (
+        # Every index ends in (created_at, id) so keyset pages of the audit
+        # query API are a single range scan per partition.
+        Index("ix_audit_logs_created_at_id", "created_at", "id"),
+        Index("ix_audit_logs_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_audit_logs_action_type_created_at_id", "action_type", "created_at", "id"),
+        Index(
+            "ix_audit_logs_ip_address_created_at_id", "ip_address", "created_at", "id",
+            postgresql_where=text("ip_address IS NOT NULL"),
+        ),
+        Index("ix_audit_logs_metadata", "metadata", postgresql_using="gin"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, DateTime, Index, func, text
+from app.db.base import Base
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(BigInteger, primary_key=True)
+    to_email = Column(Text, nullable=False)
+    subject = Column(Text, nullable=False)
+    html_content = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending", server_default="pending")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index(
+            "ix_email_outbox_pending",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
+        Index(
+            "ix_email_outbox_finished",
+            "next_attempt_at",
+            postgresql_where=text("status IN ('sent', 'dead')"),
+        ),
+    )
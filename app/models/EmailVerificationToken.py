@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, ForeignKey, Boolean, DateTime, Text, func
+from sqlalchemy import Column, BigInteger, ForeignKey, Boolean, DateTime, Text, Index, func
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
@@ -12,4 +12,8 @@ class EmailVerificationToken(Base):
     used = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    user = relationship("User", back_populates="email_tokens")
\ No newline at end of file
+    user = relationship("User", back_populates="email_tokens")
+
+    __table_args__ = (
+        Index("ix_email_verification_tokens_token_hash", "token_hash", unique=True),
+    )
@@ -1,5 +1,5 @@
 from app.db.base import Base
-from sqlalchemy import Column, BigInteger, DateTime, Text, Boolean, func, ForeignKey
+from sqlalchemy import Column, BigInteger, DateTime, Text, Boolean, Index, func, ForeignKey
 from sqlalchemy.orm import relationship
 
 class PasswordResetToken(Base):
@@ -13,3 +13,7 @@ class PasswordResetToken(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="reset_tokens")
+
+    __table_args__ = (
+        Index("ix_password_reset_tokens_token_hash", "token_hash", unique=True),
+    )
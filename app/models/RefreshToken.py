@@ -1,5 +1,5 @@
 from app.db.base import Base
-from sqlalchemy import Column, BigInteger, ForeignKey, Text, DateTime, Boolean, func
+from sqlalchemy import Column, BigInteger, ForeignKey, Text, DateTime, Boolean, Index, func, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import INET
 
@@ -14,6 +14,18 @@ class RefreshToken(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     expires_at = Column(DateTime(timezone=True), nullable=False)
     revoked = Column(Boolean, default=False)
+    # Rotation chain: every token issued by /auth/refresh points at the one it
+    # replaced; family_id is the id of the login's first token (NULL on it).
+    family_id = Column(BigInteger)
+    parent_id = Column(BigInteger, ForeignKey("refresh_tokens.id", ondelete="SET NULL"), index=True)
+    # Set when the token was revoked by rotation (as opposed to logout/revocation)
+    rotated_at = Column(DateTime(timezone=True))
 
     user = relationship("User", back_populates="refresh_tokens")
-    session = relationship("Session", back_populates="refresh_token", uselist=False)
\ No newline at end of file
+    session = relationship("Session", back_populates="refresh_token", uselist=False)
+
+    __table_args__ = (
+        # Rotation leaves a revoked row behind per refresh, so only the live
+        # ones are worth indexing for per-user revocation.
+        Index("ix_refresh_tokens_user_id_live", "user_id", postgresql_where=text("revoked IS NOT TRUE")),
+    )
@@ -1,7 +1,16 @@
 from app.db.base import Base
-from sqlalchemy import Column, String, DateTime, func
+from sqlalchemy import BigInteger, Column, Identity, Index, String, DateTime, func, text
 
 class RevokedToken(Base):
     __tablename__ = 'revoked_tokens'
     jti = Column(String, primary_key=True)
-    revoked_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    expires_at = Column(DateTime(timezone=True), index=True)
+    # Feed cursor: (txid, seq). txid is the inserting transaction's id, so a
+    # reader can hold back rows from transactions that may still commit.
+    txid = Column(BigInteger, nullable=False, server_default=text("(pg_current_xact_id()::text)::bigint"))
+    seq = Column(BigInteger, Identity(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_revoked_tokens_txid_seq", "txid", "seq"),
+    )
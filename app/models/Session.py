@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, Text, DateTime, ForeignKey, Boolean, func
+from sqlalchemy import Column, BigInteger, Text, DateTime, ForeignKey, Boolean, Index, func, text
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
@@ -15,6 +15,17 @@ class Session(Base):
     user = relationship("User", back_populates="sessions")
     refresh_token = relationship("RefreshToken", back_populates="session")
 
+    __table_args__ = (
+        # Serves the per-user listing (read backwards for last_used_at DESC).
+        Index("ix_sessions_user_id_last_used_at", "user_id", "last_used_at"),
+        # Live sessions only, newest first when read backwards: the session
+        # cap walks just these, however many revoked ones pile up.
+        Index(
+            "ix_sessions_user_id_live_last_used_at", "user_id", "last_used_at", "id",
+            postgresql_where=text("revoked IS NOT TRUE"),
+        ),
+    )
+
     @property
     def ip_address(self) -> str | None:
         if self.refresh_token is not None and self.refresh_token.ip_address:
@@ -12,6 +12,7 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     is_verified = Column(Boolean, default=False)
     is_active = Column(Boolean, default=False)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     
 
     roles = relationship("Role", secondary = "user_roles", back_populates="users")
@@ -1,8 +1,13 @@
 from app.db.base import Base
-from sqlalchemy import Column, BigInteger, ForeignKey
+from sqlalchemy import Column, BigInteger, ForeignKey, Index
 
 class UserRole(Base):
     __tablename__ = "user_roles"
 
     user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     role_id = Column(BigInteger, ForeignKey("roles.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        # The primary key leads with user_id; this covers lookups by role.
+        Index("ix_user_roles_role_id_user_id", "role_id", "user_id"),
+    )
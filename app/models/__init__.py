@@ -9,4 +9,5 @@ from app.models.AuditAction import AuditAction
 from app.models.EmailVerificationToken import EmailVerificationToken
 from app.models.PasswordResetToken import PasswordResetToken
 from app.models.RefreshToken import RefreshToken
-from app.models.RevokedToken import RevokedToken
\ No newline at end of file
+from app.models.RevokedToken import RevokedToken
+from app.models.EmailOutbox import EmailOutbox
\ No newline at end of file
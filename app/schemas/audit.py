@@ -1,15 +1,28 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+
+from app.models.AuditAction import AuditAction
 
 
 class AuditLogRead(BaseModel):
     id: int
-    action_type: str
+    user_id: Optional[int] = None
+    action_type: AuditAction
     metadata: dict | None = Field(default=None, validation_alias="metadata_")
     ip_address: Optional[str]
     user_agent: Optional[str]
     created_at: datetime
 
+    @field_validator("ip_address", mode="before")
+    @classmethod
+    def _ip_to_str(cls, value):
+        return str(value) if value is not None else None
+
     class Config:
         from_attributes = True
+
+
+class AuditLogPage(BaseModel):
+    items: List[AuditLogRead]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "audit_logs"
+
+# Arbitrary constant so only one worker runs partition DDL at a time.
+_MAINTENANCE_LOCK_KEY = 0x61756469  # "audi"
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+class Partition(NamedTuple):
+    name: str
+    lower: Optional[datetime]  # None for MINVALUE
+    upper: Optional[datetime]  # None for MAXVALUE
+
+
+def _month_start(dt: datetime) -> datetime:
+    return dt.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_month(dt: datetime) -> datetime:
+    return (dt.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(month_start: datetime) -> str:
+    return f"{PARENT_TABLE}_p{month_start:%Y%m}"
+
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+async def list_partitions(db: AsyncSession) -> List[Partition]:
+    res = await db.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:parent AS regclass)
+    """), {"parent": PARENT_TABLE})
+
+    partitions = []
+    for name, bound in res.all():
+        match = _BOUND_RE.search(bound or "")
+        if not match:
+            continue
+        partitions.append(Partition(name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+    return sorted(partitions, key=lambda p: p.lower or datetime.min.replace(tzinfo=timezone.utc))
+
+
+async def ensure_partitions(db: AsyncSession, months_ahead: int = settings.AUDIT_PARTITIONS_AHEAD) -> List[str]:
+    """
+    Create monthly partitions from the current month through `months_ahead`
+    months out. Creation starts exactly where the existing partitions end; if
+    that is not a UTC month boundary, the first partition only fills the rest
+    of that month, so no range is left uncovered.
+    """
+    partitions = await list_partitions(db)
+    covered_until = max((p.upper for p in partitions if p.upper is not None), default=None)
+
+    start = _month_start(datetime.now(timezone.utc))
+    if covered_until is not None and covered_until > start:
+        start = covered_until.astimezone(timezone.utc)
+
+    end = _month_start(datetime.now(timezone.utc))
+    for _ in range(months_ahead + 1):
+        end = _add_month(end)
+
+    created = []
+    while start < end:
+        month = _month_start(start)
+        upper = _add_month(month)
+        name = partition_name(month) if start == month else f"{partition_name(month)}_{start:%d%H%M%S}"
+        await db.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {PARENT_TABLE} '
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{upper.isoformat()}')"
+        ))
+        created.append(name)
+        start = upper
+    return created
+
+
+async def drop_expired_partitions(db: AsyncSession, retention_days: int = settings.AUDIT_RETENTION_DAYS) -> List[str]:
+    """Detach and drop partitions whose newest possible row is older than the retention window."""
+    if not retention_days:
+        return []
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    dropped = []
+    for p in await list_partitions(db):
+        if p.upper is not None and p.upper <= cutoff:
+            await db.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{p.name}"'))
+            await db.execute(text(f'DROP TABLE "{p.name}"'))
+            dropped.append(p.name)
+    return dropped
+
+
+async def run_maintenance(db: AsyncSession) -> None:
+    locked = (await db.execute(
+        text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _MAINTENANCE_LOCK_KEY}
+    )).scalar()
+    if not locked:
+        return
+
+    created = await ensure_partitions(db)
+    dropped = await drop_expired_partitions(db)
+    await db.commit()
+
+    if created or dropped:
+        logger.info("Audit partitions created=%s dropped=%s", created, dropped)
+
+
+async def run(session_factory: async_sessionmaker) -> None:
+    """Maintenance loop started from the application lifespan."""
+    while True:
+        try:
+            async with session_factory() as db:
+                await run_maintenance(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Audit partition maintenance failed")
+        await asyncio.sleep(settings.AUDIT_PARTITION_MAINTENANCE_SECONDS)
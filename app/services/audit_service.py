@@ -1,26 +1,244 @@
 from __future__ import annotations
-from typing import Optional, Dict, Any
+import asyncio
+import base64
+import ipaddress
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple
 
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import BigInteger, DateTime, cast, event, insert, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import INET, array
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models.AuditLog import AuditLog
 from app.models.AuditAction import AuditAction
 
+logger = logging.getLogger(__name__)
+
+# Actions written by the background batch writer instead of inside the
+# caller's transaction. Everything else stays sync-in-transaction.
+ASYNC_ACTIONS = frozenset(AuditAction(a) for a in settings.AUDIT_ASYNC_ACTIONS)
+
+# Session.info key holding async rows until the caller's transaction ends
+_PENDING_ROWS = "audit_rows"
+
+
+class AuditWriter:
+    """
+    Buffers audit rows in a bounded in-process queue and writes them with
+    one multi-row INSERT per batch, flushing when `batch_size` rows are
+    waiting or `flush_seconds` have passed, and once more on shutdown.
+
+    Rows reach the queue only after the request's transaction commits (see
+    `log_action`), so a rolled-back request never leaves an audit entry.
+    """
+
+    def __init__(
+            self,
+            max_queue: int = settings.AUDIT_QUEUE_SIZE,
+            batch_size: int = settings.AUDIT_BATCH_SIZE,
+            flush_seconds: float = settings.AUDIT_FLUSH_SECONDS,
+    ):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self.written = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+
+    @property
+    def full(self) -> bool:
+        return self._queue is not None and self._queue.full()
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """Queue a row; False when the writer is not running or the queue is full."""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _write(self, session_factory: async_sessionmaker, rows: List[Dict[str, Any]]) -> None:
+        for attempt in range(2):
+            try:
+                async with session_factory() as db:
+                    await db.execute(insert(AuditLog), rows)
+                    await db.commit()
+                self.written += len(rows)
+                return
+            except Exception:
+                if attempt:
+                    self.dropped += len(rows)
+                    logger.exception("Dropping %s audit rows after failed batch insert", len(rows))
+
+    def _drain(self, rows: List[Dict[str, Any]]) -> None:
+        assert self._queue is not None
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
+    async def run(self, session_factory: async_sessionmaker) -> None:
+        """Writer loop started from the application lifespan."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        rows: List[Dict[str, Any]] = []
+        try:
+            while True:
+                deadline = time.monotonic() + self.flush_seconds
+                while len(rows) < self.batch_size:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        rows.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                    self._drain(rows)
+
+                if rows:
+                    batch, rows = rows, []
+                    try:
+                        await self._write(session_factory, batch)
+                    except asyncio.CancelledError:
+                        # Shutdown hit the insert; flush the batch again below.
+                        rows = batch + rows
+                        raise
+        finally:
+            # Shutdown: stop accepting rows and flush whatever is buffered.
+            queue, self._queue = self._queue, None
+            while not queue.empty():
+                rows.append(queue.get_nowait())
+            for i in range(0, len(rows), self.batch_size):
+                await self._write(session_factory, rows[i:i + self.batch_size])
+
+
+audit_writer = AuditWriter()
+
+
+def _submit_pending(session: Session) -> None:
+    for row in session.info.pop(_PENDING_ROWS, ()):
+        if not audit_writer.submit(row):
+            audit_writer.dropped += 1
+            logger.warning("Audit queue full after commit; dropped %s row for user %s",
+                           row["action_type"], row["user_id"])
+
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_ROWS, None)
+
+def _defer(db: AsyncSession, row: Dict[str, Any]) -> None:
+    session = db.sync_session
+    session.info.setdefault(_PENDING_ROWS, []).append(row)
+    if not event.contains(session, "after_commit", _submit_pending):
+        event.listen(session, "after_commit", _submit_pending)
+        event.listen(session, "after_rollback", _discard_pending)
+
+
 async def log_action(
-        db: AsyncSession, 
-        user_id:Optional[int], 
-        action_type: AuditAction, 
+        db: AsyncSession,
+        user_id:Optional[int],
+        action_type: AuditAction,
         metadata: Optional[Dict[str, Any]] = None,
         ip_address: Optional[str] = None,
         user_agent: Optional[str] = None
         ) -> None:
-    log = AuditLog(
-            user_id=user_id,
-            action_type = action_type,
-            metadata_=metadata or {},
-            ip_address= ip_address,
-            user_agent=user_agent
-        )
-
-    db.add(log)
-    await db.flush()
\ No newline at end of file
+    row = dict(
+        user_id=user_id,
+        action_type=action_type,
+        metadata_=metadata or {},
+        ip_address=ip_address,
+        user_agent=user_agent,
+        created_at=datetime.now(timezone.utc),
+    )
+
+    if action_type in ASYNC_ACTIONS and audit_writer.running and not audit_writer.full:
+        # Handed to the writer once the caller commits, like the cache
+        # invalidation in role_service; dropped if the caller rolls back.
+        _defer(db, row)
+        return
+
+    # Sync mode (or writer unavailable/full): the row is written by the
+    # caller's own commit, with no extra round trip of its own.
+    db.add(AuditLog(**row))
+
+
+def encode_cursor(created_at: datetime, log_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{log_id}".encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, log_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(log_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+async def query_logs(
+        db: AsyncSession,
+        user_id: Optional[int] = None,
+        action_type: Optional[AuditAction] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        ip_address: Optional[str] = None,
+        metadata_keys: Optional[List[str]] = None,
+        metadata_contains: Optional[Dict[str, Any]] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+) -> Tuple[List[AuditLog], Optional[str]]:
+    """
+    Newest-first page of audit rows plus the cursor for the next page.
+
+    Pages are keyed on (created_at, id) rather than OFFSET, so each page is
+    an index range scan no matter how deep it is; time bounds also prune
+    audit_logs partitions.
+    """
+    stmt = select(AuditLog)
+
+    if user_id is not None:
+        stmt = stmt.where(AuditLog.user_id == user_id)
+    if action_type is not None:
+        stmt = stmt.where(AuditLog.action_type == action_type)
+    if since is not None:
+        stmt = stmt.where(AuditLog.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(AuditLog.created_at < until)
+    if ip_address is not None:
+        # Raises ValueError for garbage instead of a database error.
+        ipaddress.ip_network(ip_address, strict=False)
+        if "/" in ip_address:
+            stmt = stmt.where(AuditLog.ip_address.op("<<=")(cast(ip_address, INET)))
+        else:
+            stmt = stmt.where(AuditLog.ip_address == ip_address)
+    if metadata_keys:
+        stmt = stmt.where(AuditLog.metadata_.has_all(array(metadata_keys)))
+    if metadata_contains:
+        stmt = stmt.where(AuditLog.metadata_.contains(metadata_contains))
+
+    if cursor:
+        after_created, after_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(AuditLog.created_at, AuditLog.id) < tuple_(
+            literal(after_created, DateTime(timezone=True)), literal(after_id, BigInteger)
+        ))
+
+    stmt = stmt.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limit + 1)
+
+    res = await db.execute(stmt)
+    rows = list(res.scalars().all())
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id) #type: ignore
+
+    return rows, next_cursor
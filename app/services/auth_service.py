@@ -4,17 +4,27 @@ from app.schemas.password import PasswordResetConfirm
 from app.models.User import User
 from app.models.EmailVerificationToken import EmailVerificationToken
 from app.models.PasswordResetToken import PasswordResetToken
+from app.core.config import settings
+from app.core.hashing import hashing_pool
 
 from passlib.context import CryptContext
 from pydantic import EmailStr
 import hashlib
+import logging
+import math
 import secrets
+import time
 from datetime import datetime, timedelta, timezone
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import select, update
+
+logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Active bcrypt cost, reported by /diagnostics/hashing
+hashing_profile: dict = {"rounds": None, "min_rounds": None, "max_rounds": None, "source": "passlib-default", "measured_ms": None, "target_ms": None}
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -22,13 +32,85 @@ def hash_password(password: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
+async def hash_password_async(password: str) -> str:
+    return await hashing_pool.run(hash_password, password)
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await hashing_pool.run(verify_password, plain, hashed)
+
+def password_needs_rehash(hashed: str) -> bool:
+    return pwd_context.needs_update(hashed)
+
+def _measure_bcrypt_ms(rounds: int, samples: int = 3) -> float:
+    bcrypt = pwd_context.handler("bcrypt").using(rounds=rounds)
+    best = float("inf")
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.hash("calibration-password")
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def calibrate_bcrypt_rounds(target_ms: float) -> int:
+    """Largest rounds whose hash time stays within `target_ms`; each extra round doubles the cost."""
+    low = settings.BCRYPT_MIN_ROUNDS
+    base_ms = _measure_bcrypt_ms(low)
+    extra = math.floor(math.log2(target_ms / base_ms)) if target_ms > base_ms else 0
+    return max(low, min(low + extra, settings.BCRYPT_MAX_ROUNDS))
+
+def configure_password_hashing() -> dict:
+    """
+    Apply the bcrypt cost from settings. A fixed BCRYPT_ROUNDS is both the
+    floor and the ceiling for `needs_update`, so raising or lowering it
+    rehashes passwords on login. A calibrated cost only applies to new
+    hashes: it can differ between workers on different hardware, so existing
+    hashes are only upgraded when below BCRYPT_MIN_ROUNDS; otherwise two
+    workers would keep rehashing each other's passwords. Pin BCRYPT_ROUNDS
+    to move existing hashes to a calibrated cost.
+    """
+    if settings.BCRYPT_ROUNDS:
+        rounds, source = settings.BCRYPT_ROUNDS, "configured"
+        floor, ceiling = rounds, rounds
+    elif settings.BCRYPT_CALIBRATE:
+        rounds, source = calibrate_bcrypt_rounds(settings.BCRYPT_TARGET_MS), "calibrated"
+        floor, ceiling = settings.BCRYPT_MIN_ROUNDS, None
+    else:
+        return hashing_profile
+
+    pwd_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=floor, bcrypt__max_rounds=ceiling)
+
+    hashing_profile.update(
+        rounds=rounds,
+        min_rounds=floor,
+        max_rounds=ceiling,
+        source=source,
+        measured_ms=round(_measure_bcrypt_ms(rounds, samples=1), 1),
+        target_ms=settings.BCRYPT_TARGET_MS if source == "calibrated" else None,
+    )
+    logger.info("bcrypt cost set to %s rounds (%s, %.1f ms)", rounds, source, hashing_profile["measured_ms"])
+    return hashing_profile
+
+async def rehash_password(session_factory: async_sessionmaker, user_id: int, plain: str, old_hash: str) -> None:
+    """Re-hash a just-verified password at the current cost; runs after the login response."""
+    try:
+        new_hash = await hash_password_async(plain)
+        async with session_factory() as db:
+            # Only replace the hash we verified, never a concurrent password change.
+            await db.execute(
+                update(User)
+                .where(User.id == user_id, User.password_hash == old_hash)
+                .values(password_hash=new_hash)
+            )
+            await db.commit()
+    except Exception:
+        logger.exception("Password rehash failed for user %s", user_id)
+
 async def register_user(db: AsyncSession, user: UserCreate) -> User:
     res = await db.execute(select(User).where(User.email == user.email))
     existing = res.scalar_one_or_none()
     if existing:
         raise ValueError("User already exists")
     
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await hash_password_async(user.password)
     new_user = User(
         email = user.email,
         password_hash = hashed_pw,
@@ -51,7 +133,7 @@ async def authenticate_user(db: AsyncSession, email:EmailStr, password:str) -> U
     if user.is_active is False:
         raise ValueError("User account is deactivated")
     
-    if verify_password(password, user.password_hash) is False: #type: ignore
+    if await verify_password_async(password, user.password_hash) is False: #type: ignore
         raise ValueError("Invalid credentials")
     
     return user
@@ -102,7 +184,7 @@ async def reset_password(db: AsyncSession, new_password: PasswordResetConfirm):
         raise ValueError("Token expired")
 
     user = await db.get(User, token.user_id)
-    user.password_hash = hash_password(new_password.new_password) #type: ignore
+    user.password_hash = await hash_password_async(new_password.new_password) #type: ignore
 
     token.used = True #type: ignore
 
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import aiosmtplib
+from sqlalchemy import Row, bindparam, case, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.models.EmailOutbox import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+_PURGE_LOCK_KEY = 0x6f757462  # "outb"
+
+
+def _now_utc() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def smtp_configured() -> bool:
+    return bool(settings.SMTP_HOST and settings.SMTP_FROM)
+
+
+def build_message(to_email: str, subject: str, html_content: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = settings.SMTP_FROM
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    msg.set_content("This email requires HTML support.")
+    msg.add_alternative(html_content, subtype="html")
+    return msg
+
+
+class SmtpConnectionPool:
+    """
+    Keeps up to `size` connected (and, if configured, STARTTLS'd and
+    authenticated) SMTP clients so each message does not pay for a new
+    TCP + TLS + AUTH handshake. Idle connections older than `max_idle`
+    seconds are closed instead of reused, since servers drop them.
+    """
+
+    def __init__(self, size: int, max_idle: float = 60.0):
+        self.size = size
+        self.max_idle = max_idle
+        self._idle: List[Tuple[aiosmtplib.SMTP, float]] = []
+        self._slots = asyncio.Semaphore(size)
+
+    def _new_client(self) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            username=settings.SMTP_USER or None,
+            password=settings.SMTP_PASSWORD or None,
+            use_tls=settings.SMTP_USE_TLS,
+            start_tls=settings.SMTP_START_TLS and not settings.SMTP_USE_TLS,
+        )
+
+    async def acquire(self) -> aiosmtplib.SMTP:
+        await self._slots.acquire()
+        try:
+            now = time.monotonic()
+            while self._idle:
+                client, last_used = self._idle.pop()
+                if client.is_connected and now - last_used < self.max_idle:
+                    return client
+                await self._close(client)
+
+            client = self._new_client()
+            await client.connect()
+            return client
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, client: aiosmtplib.SMTP, broken: bool = False) -> None:
+        try:
+            if broken or not client.is_connected:
+                await self._close(client)
+            else:
+                self._idle.append((client, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    async def _close(self, client: aiosmtplib.SMTP) -> None:
+        try:
+            if client.is_connected:
+                await client.quit()
+        except Exception:
+            client.close()
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for client, _ in idle:
+            await self._close(client)
+
+
+class EmailDispatcher:
+    """
+    Drains `email_outbox` in the background.
+
+    A batch is claimed in one short transaction: rows picked with
+    `FOR UPDATE SKIP LOCKED` get their `next_attempt_at` pushed out by a
+    lease and their attempt counted, then the claim commits. Sending happens
+    outside any transaction, so SMTP latency never holds row locks or an
+    open xid, and the outcome is recorded in a second transaction. Several
+    workers can run a dispatcher side by side; rows of a worker that dies
+    mid-batch come due again when the lease expires. Failed sends are
+    retried with exponential backoff; after `max_attempts` the row is parked
+    as `dead`.
+
+    The body carries one-time verification and reset links, so it is blanked
+    once a row is `sent` or `dead`, and finished rows are deleted after
+    `retention_days`.
+    """
+
+    def __init__(
+            self,
+            pool: SmtpConnectionPool,
+            batch_size: int = settings.EMAIL_DISPATCH_BATCH_SIZE,
+            poll_seconds: float = settings.EMAIL_DISPATCH_POLL_SECONDS,
+            max_attempts: int = settings.EMAIL_MAX_ATTEMPTS,
+            retry_base_seconds: float = settings.EMAIL_RETRY_BASE_SECONDS,
+            lease_seconds: float = settings.EMAIL_CLAIM_LEASE_SECONDS,
+            retention_days: int = settings.EMAIL_OUTBOX_RETENTION_DAYS,
+            purge_seconds: float = settings.EMAIL_OUTBOX_PURGE_SECONDS,
+    ):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self.retention_days = retention_days
+        self.purge_seconds = purge_seconds
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def notify(self) -> None:
+        """Wake the dispatcher right away, e.g. after an outbox row commits."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _send(self, row: Row) -> Optional[str]:
+        msg = build_message(row.to_email, row.subject, row.html_content)  # type: ignore[arg-type]
+        for attempt in range(2):
+            try:
+                client = await self.pool.acquire()
+            except Exception as exc:
+                return f"SMTP connect failed: {exc}"
+            try:
+                await client.send_message(msg)
+            except aiosmtplib.SMTPServerDisconnected as exc:
+                await self.pool.release(client, broken=True)
+                # A pooled connection may have been dropped by the server; retry once on a fresh one.
+                if attempt == 0:
+                    continue
+                return str(exc)
+            except Exception as exc:
+                await self.pool.release(client, broken=True)
+                return str(exc) or exc.__class__.__name__
+            await self.pool.release(client)
+            return None
+        return "SMTP server disconnected"
+
+    async def _claim(self, db: AsyncSession) -> Sequence[Row]:
+        due = (
+            select(EmailOutbox.id)
+            .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= func.now())
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        res = await db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(due.scalar_subquery()))
+            .values(
+                attempts=EmailOutbox.attempts + 1,
+                next_attempt_at=func.now() + timedelta(seconds=self.lease_seconds),
+            )
+            .returning(
+                EmailOutbox.id, EmailOutbox.to_email, EmailOutbox.subject,
+                EmailOutbox.html_content, EmailOutbox.attempts,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return res.all()
+
+    def _outcome(self, row: Row, error: Optional[str]) -> Dict[str, Any]:
+        now = _now_utc()
+        if error is None:
+            return {"row_id": row.id, "claimed_attempts": row.attempts, "new_status": "sent",
+                    "new_sent_at": now, "new_last_error": None, "new_next_attempt_at": now}
+
+        if row.attempts >= self.max_attempts:
+            logger.error("Email %s dead-lettered after %s attempts: %s", row.id, row.attempts, error)
+            status, next_attempt_at = "dead", now
+        else:
+            delay = self.retry_base_seconds * (2 ** (row.attempts - 1))
+            status, next_attempt_at = "pending", now + timedelta(seconds=delay)
+        return {"row_id": row.id, "claimed_attempts": row.attempts, "new_status": status,
+                "new_sent_at": None, "new_last_error": error, "new_next_attempt_at": next_attempt_at}
+
+    async def _record(self, db: AsyncSession, outcomes: List[Dict[str, Any]]) -> None:
+        table = EmailOutbox.__table__
+        # A row whose lease ran out may have been claimed again; leave it to
+        # that claim rather than overwriting its outcome.
+        await db.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id"), table.c.attempts == bindparam("claimed_attempts"))
+            .values(
+                status=bindparam("new_status"),
+                html_content=case(
+                    (bindparam("new_status") == "pending", table.c.html_content),
+                    else_="",
+                ),
+                sent_at=bindparam("new_sent_at"),
+                last_error=bindparam("new_last_error"),
+                next_attempt_at=bindparam("new_next_attempt_at"),
+            ),
+            outcomes,
+        )
+
+    async def dispatch_once(self, session_factory: async_sessionmaker) -> int:
+        async with session_factory() as db:
+            rows = await self._claim(db)
+            await db.commit()
+        if not rows:
+            return 0
+
+        # Concurrency is bounded by the connection pool size.
+        errors = await asyncio.gather(*(self._send(row) for row in rows))
+
+        async with session_factory() as db:
+            await self._record(db, [self._outcome(row, error) for row, error in zip(rows, errors)])
+            await db.commit()
+        return len(rows)
+
+    async def purge_delivered(self, db: AsyncSession) -> int:
+        """
+        Delete `sent` and `dead` rows finished more than `retention_days` ago.
+        Only the worker holding the advisory lock purges; the others get 0
+        back and skip it.
+        """
+        locked = (await db.execute(select(func.pg_try_advisory_xact_lock(_PURGE_LOCK_KEY)))).scalar()
+        if not locked:
+            return 0
+
+        # `_outcome` sets `next_attempt_at` to the time a row finished.
+        res = await db.execute(
+            delete(EmailOutbox)
+            .where(
+                EmailOutbox.status.in_(("sent", "dead")),
+                EmailOutbox.next_attempt_at < func.now() - timedelta(days=self.retention_days),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return res.rowcount or 0
+
+    async def run(self, session_factory: async_sessionmaker) -> None:
+        """Dispatch loop started from the application lifespan."""
+        self._wakeup = asyncio.Event()
+        next_purge = time.monotonic()
+        try:
+            while True:
+                self._wakeup.clear()
+                try:
+                    sent = await self.dispatch_once(session_factory)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Email outbox dispatch failed")
+                    sent = 0
+
+                if time.monotonic() >= next_purge:
+                    next_purge = time.monotonic() + self.purge_seconds
+                    try:
+                        async with session_factory() as db:
+                            await self.purge_delivered(db)
+                            await db.commit()
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception:
+                        logger.exception("Email outbox purge failed")
+
+                if sent >= self.batch_size:
+                    continue
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.pool.close()
+
+
+email_dispatcher = EmailDispatcher(SmtpConnectionPool(settings.EMAIL_SMTP_POOL_SIZE))
@@ -1,53 +1,38 @@
 from __future__ import annotations
 
-import aiosmtplib
-from email.message import EmailMessage
-from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.User import User
+from app.models.EmailOutbox import EmailOutbox
 from app.core.config import settings
-
-SMTP_HOST = settings.SMTP_HOST
-SMTP_PORT = settings.SMTP_PORT
-SMTP_USER = settings.SMTP_USER
-SMTP_PASSWORD = settings.SMTP_PASSWORD
-SMTP_FROM = settings.SMTP_FROM
+from app.services.email_dispatcher import email_dispatcher
 
 APP_BASE_URL = str(settings.APP_BASE_URL)
 
 
-async def _send_email_async(
+async def enqueue_email(
+    db: AsyncSession,
     to_email: str,
     subject: str,
     html_content: str,
-) -> bool:
-
-    if not (SMTP_HOST and SMTP_USER and SMTP_PASSWORD and SMTP_FROM):
-        raise RuntimeError("SMTP configuration not set properly")
-
-    msg = EmailMessage()
-    msg["From"] = SMTP_FROM
-    msg["To"] = to_email
-    msg["Subject"] = subject
-    msg.set_content("This email requires HTML support.")
-    msg.add_alternative(html_content, subtype="html")
-
-    try:
-        await aiosmtplib.send(
-            msg,
-            hostname=SMTP_HOST,
-            port=SMTP_PORT,
-            start_tls=True,
-            username=SMTP_USER,
-            password=SMTP_PASSWORD,
-        )
-        return True
+) -> EmailOutbox:
+    """
+    Queue an email in the outbox as part of the caller's transaction; the
+    background dispatcher delivers it once the transaction commits.
+    """
+    item = EmailOutbox(
+        to_email=to_email,
+        subject=subject,
+        html_content=html_content,
+    )
+    db.add(item)
 
-    except Exception:
-        return False
+    event.listen(db.sync_session, "after_commit", lambda _session: email_dispatcher.notify(), once=True)
+    return item
 
 
-async def send_verification_email(user: User, raw_token: str) -> bool:
+async def send_verification_email(db: AsyncSession, user: User, raw_token: str) -> EmailOutbox:
     verify_url = f"{APP_BASE_URL}/verify-email.html?token={raw_token}"
 
     html = f"""
@@ -61,13 +46,14 @@ async def send_verification_email(user: User, raw_token: str) -> bool:
     </body>
     </html>
     """
-    return await _send_email_async(
+    return await enqueue_email(
+        db,
         to_email=user.email, #type: ignore
         subject="Verify your email",
         html_content=html,
     )
 
-async def send_password_reset_email(user: User, raw_token: str) -> bool:
+async def send_password_reset_email(db: AsyncSession, user: User, raw_token: str) -> EmailOutbox:
     """
     Sends a password reset link to the user.
     """
@@ -86,18 +72,21 @@ async def send_password_reset_email(user: User, raw_token: str) -> bool:
     </html>
     """
 
-    return await _send_email_async(
+    return await enqueue_email(
+        db,
         to_email=user.email, #type: ignore
         subject="Password Reset Request",
         html_content=html,
     )
 
 async def send_generic_email(
+    db: AsyncSession,
     to_email: str,
     subject: str,
     message_html: str,
-) -> bool:
-    return await _send_email_async(
+) -> EmailOutbox:
+    return await enqueue_email(
+        db,
         to_email=to_email,
         subject=subject,
         html_content=message_html,
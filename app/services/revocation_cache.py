@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.bloom import BloomFilter
+from app.core.config import settings
+from app.services import revocation_feed
+
+logger = logging.getLogger(__name__)
+
+ACCESS_TOKEN_TTL = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRES_MINUTES)
+
+def _now_utc() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class RevocationCache:
+    """
+    Per-process view of `revoked_tokens` for access tokens that have not yet expired.
+
+    A Bloom filter answers "definitely not revoked" for the vast majority of
+    JTIs; only possible hits consult the exact `jti -> exp` map. Entries
+    drop out once the token they revoke has expired.
+
+    Refreshes follow the same commit-ordered (txid, seq) cursor as the
+    public revocation feed rather than a `revoked_at` watermark: rows from
+    transactions that may still commit are held back by the database, so
+    neither clock skew nor a slow commit can make a refresh skip a row.
+    """
+
+    def __init__(
+            self,
+            capacity: int = settings.REVOCATION_CACHE_CAPACITY,
+            refresh_seconds: float = settings.REVOCATION_CACHE_REFRESH_SECONDS,
+            full_reload_seconds: float = settings.REVOCATION_CACHE_FULL_RELOAD_SECONDS,
+    ):
+        self._capacity = capacity
+        self._refresh_seconds = refresh_seconds
+        self._full_reload_seconds = full_reload_seconds
+        self._entries: Dict[str, float] = {}
+        self._bloom = BloomFilter(capacity)
+        self._cursor: Optional[str] = None
+        self._last_refresh: Optional[float] = None
+        self._last_full_reload = 0.0
+
+    @property
+    def ready(self) -> bool:
+        """True while the cache is loaded and has been refreshed recently enough to trust."""
+        if self._last_refresh is None:
+            return False
+        max_age = max(self._refresh_seconds * 3, 1.0)
+        return time.monotonic() - self._last_refresh <= max_age
+
+    def _rebuild_bloom(self) -> None:
+        capacity = self._capacity
+        while capacity < len(self._entries) * 2:
+            capacity *= 2
+        bloom = BloomFilter(capacity)
+        for jti in self._entries:
+            bloom.add(jti)
+        self._capacity = capacity
+        self._bloom = bloom
+
+    def add(self, jti: str, expires_at: Optional[datetime] = None) -> None:
+        exp = expires_at or (_now_utc() + ACCESS_TOKEN_TTL)
+        self._entries[jti] = exp.timestamp()
+        self._bloom.add(jti)
+        if self._bloom.count > self._bloom.capacity:
+            self._rebuild_bloom()
+
+    def is_revoked(self, jti: str) -> Optional[bool]:
+        """Cached answer, or None when the caller has to ask the database."""
+        if not self.ready:
+            return None
+        if not self._bloom.might_contain(jti):
+            return False
+        exp = self._entries.get(jti)
+        return exp is not None and exp > time.time()
+
+    def _prune(self) -> None:
+        now = time.time()
+        self._entries = {jti: exp for jti, exp in self._entries.items() if exp > now}
+
+    async def refresh(self, db: AsyncSession) -> None:
+        full = (
+            self._last_refresh is None
+            or time.monotonic() - self._last_full_reload >= self._full_reload_seconds
+        )
+
+        if full:
+            await revocation_feed.purge_expired(db)
+            await db.commit()
+
+        page = await revocation_feed.read_feed(db, None if full else self._cursor)
+
+        # Revocations are never undone, so a full reload merges instead of
+        # replacing: entries added locally but still held back by the feed
+        # horizon must survive it.
+        for jti, exp in page.items:
+            self._entries[jti] = exp
+            if not full:
+                self._bloom.add(jti)
+
+        if full:
+            self._prune()
+            self._rebuild_bloom()
+            self._last_full_reload = time.monotonic()
+        elif self._bloom.count > self._bloom.capacity:
+            self._rebuild_bloom()
+
+        # A full read that found nothing returns no cursor; the old one is
+        # still a valid resume point.
+        if page.next_cursor is not None:
+            self._cursor = page.next_cursor
+        self._last_refresh = time.monotonic()
+
+    async def run(self, session_factory: async_sessionmaker) -> None:
+        """Refresh loop started from the application lifespan."""
+        while True:
+            try:
+                async with session_factory() as db:
+                    await self.refresh(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Revoked token cache refresh failed")
+            await asyncio.sleep(self._refresh_seconds)
+
+
+revocation_cache = RevocationCache()
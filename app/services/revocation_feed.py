@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import BigInteger, and_, delete, func, literal, literal_column, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.RevokedToken import RevokedToken
+
+ACCESS_TOKEN_TTL = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRES_MINUTES)
+
+# Arbitrary constant so only one worker purges at a time.
+_PURGE_LOCK_KEY = 0x7265766f  # "revo"
+
+# Oldest transaction id that may still be running. Rows written by it or by
+# anything newer are held back, so a cursor never skips a late commit.
+_SNAPSHOT_XMIN = select(
+    literal_column("(pg_snapshot_xmin(pg_current_snapshot())::text)::bigint", BigInteger)
+).scalar_subquery()
+
+_expires_at = func.coalesce(RevokedToken.expires_at, RevokedToken.revoked_at + ACCESS_TOKEN_TTL)
+
+
+class FeedPage(NamedTuple):
+    items: List[Tuple[str, int]]  # (jti, exp as unix seconds)
+    next_cursor: Optional[str]
+    has_more: bool
+
+
+def encode_cursor(txid: int, seq: int) -> str:
+    return f"{txid}.{seq}"
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        txid, seq = cursor.split(".", 1)
+        return int(txid), int(seq)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+async def read_feed(db: AsyncSession, cursor: Optional[str] = None, limit: Optional[int] = None) -> FeedPage:
+    """
+    Revocations committed after `cursor`, oldest first, skipping tokens that
+    have already expired.
+
+    The cursor is the (txid, seq) of the last row returned, so it survives
+    restarts and means the same thing on every node.
+    """
+    stmt = (
+        select(RevokedToken.jti, _expires_at, RevokedToken.txid, RevokedToken.seq)
+        .where(RevokedToken.txid < _SNAPSHOT_XMIN, _expires_at > func.now())
+        .order_by(RevokedToken.txid, RevokedToken.seq)
+    )
+    if cursor:
+        txid, seq = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(RevokedToken.txid, RevokedToken.seq) > tuple_(
+            literal(txid, BigInteger), literal(seq, BigInteger)
+        ))
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+
+    rows = (await db.execute(stmt)).all()
+    has_more = limit is not None and len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+
+    next_cursor = encode_cursor(rows[-1].txid, rows[-1].seq) if rows else cursor
+    items = [(jti, int(exp.timestamp())) for jti, exp, _, _ in rows]
+    return FeedPage(items, next_cursor, has_more)
+
+async def purge_expired(db: AsyncSession, grace: timedelta = timedelta(hours=1)) -> int:
+    """
+    Delete revocations whose token expired more than `grace` ago; they can no
+    longer matter. Only the worker holding the advisory lock purges; the
+    others get 0 back and skip it.
+    """
+    locked = (await db.execute(select(func.pg_try_advisory_xact_lock(_PURGE_LOCK_KEY)))).scalar()
+    if not locked:
+        return 0
+
+    # `_expires_at` spelled out per branch, so each side can use the index
+    # on its own column instead of scanning for the coalesce.
+    cutoff = func.now() - grace
+    res = await db.execute(delete(RevokedToken).where(or_(
+        and_(RevokedToken.expires_at.isnot(None), RevokedToken.expires_at < cutoff),
+        and_(RevokedToken.expires_at.is_(None), RevokedToken.revoked_at < cutoff - ACCESS_TOKEN_TTL),
+    )))
+    return res.rowcount or 0
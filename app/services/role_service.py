@@ -1,8 +1,14 @@
 from __future__ import annotations
-from typing import Optional, List
+import base64
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, List, Tuple
 
+from sqlalchemy import event, select, delete, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+
+from app.core.cache import TTLCache
+from app.core.config import settings
 
 from app.schemas.role import RoleCreate 
 from app.models.Role import Role
@@ -13,6 +19,86 @@ from app.schemas.permission import PermissionBase
 from app.models.RolePermission import RolePermission
 
 
+@dataclass(frozen=True)
+class UserAccess:
+    role_ids: FrozenSet[int]
+    roles: FrozenSet[str]
+    permissions: FrozenSet[str]
+    permission_ids: FrozenSet[int]
+
+
+# Keyed by (user_id, token_version): every role change bumps the version, so
+# entries cached by other workers stop matching as soon as it commits.
+_access_cache: TTLCache[Tuple[int, Optional[int]], UserAccess] = TTLCache(
+    maxsize=settings.PERMISSION_CACHE_MAX_USERS,
+    ttl=settings.PERMISSION_CACHE_TTL_SECONDS,
+)
+
+
+def _invalidate(db: AsyncSession, fn: Callable[[], None]) -> None:
+    # Drop now, and again once the change is visible to other transactions,
+    # so a concurrent resolve cannot re-cache the pre-commit state.
+    fn()
+    event.listen(db.sync_session, "after_commit", lambda _session: fn(), once=True)
+
+def invalidate_user_access(db: AsyncSession, user_id: int) -> None:
+    _invalidate(db, lambda: _access_cache.discard_where(lambda key, _access: key[0] == user_id))
+
+def invalidate_role_access(db: AsyncSession, role_id: int) -> None:
+    _invalidate(db, lambda: _access_cache.discard_where(lambda _uid, access: role_id in access.role_ids))
+
+async def _bump_token_versions(db: AsyncSession, *, user_id: Optional[int] = None, role_id: Optional[int] = None) -> None:
+    # Access tokens carry the roles/permissions they were minted with; bumping
+    # the version makes those already issued to affected users stale.
+    stmt = update(User).values(token_version=User.token_version + 1)
+    if user_id is not None:
+        stmt = stmt.where(User.id == user_id)
+    else:
+        stmt = stmt.where(User.id.in_(select(UserRole.user_id).where(UserRole.role_id == role_id)))
+
+    await db.execute(stmt.execution_options(synchronize_session=False))
+
+
+# Permission bitmask carried in access tokens: bit N is set for the
+# permission with id N. Ids are never reused, so a bit keeps its meaning.
+
+_permission_ids: Dict[str, int] = {}
+_permission_ids_loaded_at = 0.0
+_PERMISSION_INDEX_RELOAD_SECONDS = 5.0
+
+def encode_permission_mask(permission_ids: Iterable[int]) -> str:
+    mask = 0
+    for perm_id in permission_ids:
+        mask |= 1 << perm_id
+    raw = mask.to_bytes((mask.bit_length() + 7) // 8 or 1, "little")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+def decode_permission_mask(encoded: str) -> int:
+    raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+    return int.from_bytes(raw, "little")
+
+async def _load_permission_index(db: AsyncSession) -> None:
+    global _permission_ids, _permission_ids_loaded_at
+    res = await db.execute(select(Permission.name, Permission.id))
+    _permission_ids = {name: perm_id for name, perm_id in res.all()}
+    _permission_ids_loaded_at = time.monotonic()
+
+async def get_permission_mask(db: AsyncSession, names: Iterable[str]) -> Optional[int]:
+    """Bitmask for `names`, or None if any of them is not a known permission."""
+    names = list(names)
+    if any(n not in _permission_ids for n in names):
+        if time.monotonic() - _permission_ids_loaded_at >= _PERMISSION_INDEX_RELOAD_SECONDS:
+            await _load_permission_index(db)
+
+    mask = 0
+    for n in names:
+        perm_id = _permission_ids.get(n)
+        if perm_id is None:
+            return None
+        mask |= 1 << perm_id
+    return mask
+
+
 async def create_role(db: AsyncSession, data: RoleCreate) -> Role:
     res = await db.execute(select(Role).where(Role.name == data.name))
     existing = res.scalar_one_or_none()
@@ -45,8 +131,10 @@ async def delete_role(db: AsyncSession, role_id: int) -> bool:
     if not role:
         return False
 
+    await _bump_token_versions(db, role_id=role_id)
     await db.delete(role)
     await db.flush()
+    invalidate_role_access(db, role_id)
     return True
 
 
@@ -65,6 +153,8 @@ async def remove_role_from_user(db: AsyncSession, user: User, role: Role) -> boo
 
     await db.delete(existing)
     await db.flush()
+    await _bump_token_versions(db, user_id=user.id) #type: ignore
+    invalidate_user_access(db, user.id) #type: ignore
     return True
 
 async def get_user_roles(db: AsyncSession, user_id: int) -> List[Role]:
@@ -88,6 +178,7 @@ async def create_permission(db: AsyncSession, data: PermissionBase) -> Permissio
 
     await db.flush()
     await db.refresh(perm)
+    _permission_ids[perm.name] = perm.id #type: ignore
 
     return perm
 
@@ -114,6 +205,8 @@ async def assign_permission_to_role(db: AsyncSession, role: Role, perm: Permissi
     db.add(link)
 
     await db.flush()
+    await _bump_token_versions(db, role_id=role.id) #type: ignore
+    invalidate_role_access(db, role.id) #type: ignore
     return True
 
 async def assign_role_to_user(db: AsyncSession, user: User, role:Role ):
@@ -131,6 +224,8 @@ async def assign_role_to_user(db: AsyncSession, user: User, role:Role ):
     link = UserRole(user_id = user.id, role_id=role.id)
     db.add(link)
     await db.flush()
+    await _bump_token_versions(db, user_id=user.id) #type: ignore
+    invalidate_user_access(db, user.id) #type: ignore
     return True
 
 async def remove_permission_from_role(db: AsyncSession, role:Role, perm: Permission) -> bool:
@@ -148,6 +243,8 @@ async def remove_permission_from_role(db: AsyncSession, role:Role, perm: Permiss
     
     await db.delete(row)
     await db.flush()
+    await _bump_token_versions(db, role_id=role.id) #type: ignore
+    invalidate_role_access(db, role.id) #type: ignore
 
     return True
 
@@ -159,17 +256,32 @@ async def get_role_permissions(db: AsyncSession, role_id: int) -> List[Permissio
     )
     return list(result.scalars().all())
 
-async def get_user_permissions(db: AsyncSession, user_id: int) -> List[str]:
-    roles = await get_user_roles(db, user_id)
+async def resolve_user_access(db: AsyncSession, user_id: int, token_version: Optional[int] = None) -> UserAccess:
+    cached = _access_cache.get((user_id, token_version))
+    if cached is not None:
+        return cached
 
-    if not roles:
-        return []
-    
-    perm_names = set()
+    res = await db.execute(
+        select(Role.id, Role.name, Permission.id, Permission.name)
+        .select_from(UserRole)
+        .join(Role, Role.id == UserRole.role_id)
+        .outerjoin(RolePermission, RolePermission.role_id == Role.id)
+        .outerjoin(Permission, Permission.id == RolePermission.permission_id)
+        .where(UserRole.user_id == user_id)
+    )
 
-    for role in roles:
-        perms = await get_role_permissions(db, role.id) #type: ignore
-        for p in perms:
-            perm_names.add(p.name)
-    
-    return list(perm_names)
\ No newline at end of file
+    role_ids, roles, perm_ids, perms = set(), set(), set(), set()
+    for role_id, role_name, perm_id, perm_name in res.all():
+        role_ids.add(role_id)
+        roles.add(role_name)
+        if perm_id is not None:
+            perm_ids.add(perm_id)
+            perms.add(perm_name)
+
+    access = UserAccess(frozenset(role_ids), frozenset(roles), frozenset(perms), frozenset(perm_ids))
+    _access_cache.set((user_id, token_version), access)
+    return access
+
+async def get_user_permissions(db: AsyncSession, user_id: int) -> List[str]:
+    access = await resolve_user_access(db, user_id)
+    return list(access.permissions)
\ No newline at end of file
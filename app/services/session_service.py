@@ -1,12 +1,136 @@
-from datetime import datetime, timezone
-from typing import List
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import update, select
+import asyncio
+import enum
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import BigInteger, DateTime, column, func, or_, true, update, select, values
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.models.User import User
 from app.models.RefreshToken import RefreshToken
 from app.models.Session import Session
+from app.services.user_service import bump_token_version
+
+logger = logging.getLogger(__name__)
+
+
+class SessionActivity:
+    """
+    Coalesces session `last_used_at` writes. `touch` only records the time
+    in memory; every `flush_seconds` the pending times go out as one
+
+        UPDATE sessions SET last_used_at = v.last_used_at
+        FROM (VALUES ...) AS v (id, last_used_at) WHERE ...
+
+    per `batch_size` sessions, and once more on shutdown. A session is only
+    rewritten when its stored time is more than `precision_seconds` older,
+    which also keeps several workers from rewriting the same hot row, and
+    one this worker has just written is not queued again for that long.
+    """
+
+    def __init__(
+            self,
+            flush_seconds: float = settings.SESSION_ACTIVITY_FLUSH_SECONDS,
+            precision_seconds: int = settings.SESSION_ACTIVITY_PRECISION_SECONDS,
+            max_pending: int = settings.SESSION_ACTIVITY_MAX_PENDING,
+            batch_size: int = 1000,
+    ):
+        self.flush_seconds = flush_seconds
+        self.precision_seconds = precision_seconds
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self._pending: Dict[int, datetime] = {}
+        self._recent: TTLCache[int, bool] = TTLCache(maxsize=max_pending, ttl=precision_seconds)
+        self.written = 0
+        self.dropped = 0
+
+    def touch(self, session_id: int, at: Optional[datetime] = None) -> None:
+        at = at or datetime.now(timezone.utc)
+        if session_id in self._pending:
+            self._pending[session_id] = at
+        elif self._recent.get(session_id) is None:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending[session_id] = at
+
+    def last_seen(self, session_id: int) -> Optional[datetime]:
+        """A time recorded here but not yet written, if any."""
+        return self._pending.get(session_id)
+
+    async def _write(self, db: AsyncSession, batch: List[tuple]) -> int:
+        activity = values(
+            column("id", BigInteger), column("last_used_at", DateTime(timezone=True)), name="activity"
+        ).data(batch)
+        res = await db.execute(
+            update(Session)
+            .where(
+                Session.id == activity.c.id,
+                Session.revoked.isnot(True),
+                or_(
+                    Session.last_used_at.is_(None),
+                    Session.last_used_at < activity.c.last_used_at - timedelta(seconds=self.precision_seconds),
+                ),
+            )
+            .values(last_used_at=activity.c.last_used_at)
+            .execution_options(synchronize_session=False)
+        )
+        return res.rowcount  # type: ignore[attr-defined]
+
+    async def flush(self, session_factory: async_sessionmaker) -> int:
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, {}
+        # Sorted by id so concurrent flushes from several workers lock rows
+        # in the same order.
+        items = sorted(pending.items())
+        written = 0
+        try:
+            async with session_factory() as db:
+                for i in range(0, len(items), self.batch_size):
+                    written += await self._write(db, items[i:i + self.batch_size])
+                await db.commit()
+        except Exception:
+            # Keep the times for the next flush unless newer ones arrived.
+            for session_id, at in items:
+                self._pending.setdefault(session_id, at)
+            raise
+
+        for session_id, _ in items:
+            self._recent.set(session_id, True)
+        self.written += written
+        return written
+
+    async def run(self, session_factory: async_sessionmaker) -> None:
+        """Flush loop started from the application lifespan."""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_seconds)
+                try:
+                    await self.flush(session_factory)
+                except Exception:
+                    logger.exception("Session activity flush failed")
+        finally:
+            try:
+                await self.flush(session_factory)
+            except Exception:
+                logger.exception("Final session activity flush failed")
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+session_activity = SessionActivity()
+
 
 async def create_session(
         db: AsyncSession,
@@ -27,48 +151,130 @@ async def create_session(
 
     return session
 
-async def touch_session(db: AsyncSession, session_id: int):
-    await db.execute(
+def touch_session(session_id: int) -> None:
+    """Record activity on a session; written later by `session_activity`."""
+    session_activity.touch(session_id)
+
+
+class SessionRevocation(enum.Enum):
+    REVOKED = "revoked"
+    NOT_FOUND = "not_found"
+    FORBIDDEN = "forbidden"
+
+async def revoke_session(db: AsyncSession, session_id: int, owner_id: Optional[int] = None) -> SessionRevocation:
+    """
+    Revoke a session and its refresh token in one statement. With
+    `owner_id`, only a session belonging to that user is touched, and
+    FORBIDDEN tells a foreign session apart from a missing one:
+
+        WITH target AS (SELECT user_id FROM sessions WHERE id = :sid),
+             revoked AS (UPDATE sessions ... WHERE id = :sid AND user_id = :uid
+                         RETURNING refresh_token_id),
+             revoked_token AS (UPDATE refresh_tokens ... WHERE id IN (SELECT ... FROM revoked))
+        SELECT target.user_id, revoked.refresh_token_id ...
+    """
+    target = select(Session.user_id).where(Session.id == session_id).cte("target")
+
+    conditions = [Session.id == session_id]
+    if owner_id is not None:
+        conditions.append(Session.user_id == owner_id)
+    revoked = (
         update(Session)
-        .where(Session.id == session_id)
-        .values(last_used_at=datetime.now(timezone.utc))
+        .where(*conditions)
+        .values(revoked=True)
+        .returning(Session.id, Session.refresh_token_id)
+        .cte("revoked")
+    )
+    revoked_token = (
+        update(RefreshToken)
+        .where(RefreshToken.id.in_(select(revoked.c.refresh_token_id)))
+        .values(revoked=True)
+        .returning(RefreshToken.id)
+        .cte("revoked_token")
     )
-    await db.flush()
-
 
-async def revoke_session(db: AsyncSession, session_id: int) -> bool:
     res = await db.execute(
-        select(Session). where(Session.id == session_id)
+        select(target.c.user_id, revoked.c.id, revoked_token.c.id)
+        .select_from(target)
+        .outerjoin(revoked, true())
+        .outerjoin(revoked_token, true())
     )
+    row = res.first()
 
-    session = res.scalar_one_or_none()
+    if row is None:
+        return SessionRevocation.NOT_FOUND
+    if row[1] is None:
+        return SessionRevocation.FORBIDDEN
+    return SessionRevocation.REVOKED
 
-    if not session:
-        return False
-    
-    session.revoked = True #type: ignore
+class RevokedSessions(NamedTuple):
+    sessions: int
+    refresh_tokens: int
 
-    if session.refresh_token:
-        session.refresh_token.revoked = True
-    
-    await db.flush()
-
-    return True
+async def revoke_all_sessions(db: AsyncSession, user_id: int) -> RevokedSessions:
+    """
+    Revoke every live session of the user and every live refresh token
+    (which covers the ones behind those sessions) in one statement, without
+    loading either into the session. Does not commit; the caller owns the
+    transaction.
+    """
+    # Outstanding access tokens die with the sessions; no per-JTI revocations.
+    await bump_token_version(db, user_id)
 
-async def revoke_all_sessions(db: AsyncSession, user_id: int):
-    res = await db.execute(
-        select(Session).where(Session.user_id == user_id)
-        .options(selectinload(Session.refresh_token))
+    sessions = (
+        update(Session)
+        .where(Session.user_id == user_id, Session.revoked.isnot(True))
+        .values(revoked=True)
+        .returning(Session.id)
+        .cte("revoked_sessions")
     )
-    sessions = res.scalars().all()
+    tokens = (
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked.isnot(True))
+        .values(revoked=True)
+        .returning(RefreshToken.id)
+        .cte("revoked_refresh_tokens")
+    )
+    res = await db.execute(select(
+        select(func.count()).select_from(sessions).scalar_subquery(),
+        select(func.count()).select_from(tokens).scalar_subquery(),
+    ))
+    return RevokedSessions(*res.one())
 
-    for s in sessions:
-        s.revoked = True # type: ignore
-        if s.refresh_token:
-            s.refresh_token.revoked = True
-    
-    await db.commit()
-    return True
+async def evict_excess_sessions(db: AsyncSession, user_id: int, keep: int = settings.MAX_SESSIONS_PER_USER) -> int:
+    """
+    Revoke the user's live sessions (and their refresh tokens) beyond the
+    `keep` most recently used, in one statement; returns how many. Runs in
+    the caller's transaction, so a login can call it right after inserting
+    its own session. The ordered walk stops after the live sessions, via
+    ix_sessions_user_id_live_last_used_at, so its cost is bounded by the cap.
+    """
+    if keep <= 0:
+        return 0
+
+    stale = (
+        select(Session.id)
+        .where(Session.user_id == user_id, Session.revoked.isnot(True))
+        .order_by(Session.last_used_at.desc(), Session.id.desc())
+        .offset(keep)
+        .scalar_subquery()
+    )
+    evicted = (
+        update(Session)
+        .where(Session.id.in_(stale))
+        .values(revoked=True)
+        .returning(Session.refresh_token_id)
+        .cte("evicted")
+    )
+    evicted_tokens = (
+        update(RefreshToken)
+        .where(RefreshToken.id.in_(select(evicted.c.refresh_token_id)))
+        .values(revoked=True)
+        .returning(RefreshToken.id)
+        .cte("evicted_tokens")
+    )
+    res = await db.execute(select(func.count()).select_from(evicted).add_cte(evicted_tokens))
+    return res.scalar_one()
 
 async def get_user_sessions(db: AsyncSession, user_id: int) -> List[Session]:
     result = await db.execute(
@@ -77,7 +283,14 @@ async def get_user_sessions(db: AsyncSession, user_id: int) -> List[Session]:
         .options(selectinload(Session.refresh_token))
         .order_by(Session.last_used_at.desc())
     )
-    return list(result.scalars().all())
+    sessions = list(result.scalars().all())
+
+    # Show activity this worker has not written yet, without dirtying the rows.
+    for s in sessions:
+        seen = session_activity.last_seen(s.id) #type: ignore
+        if seen is not None and (s.last_used_at is None or seen > s.last_used_at):
+            set_committed_value(s, "last_used_at", seen)
+    return sessions
 
 
 async def get_session_by_refresh_token(db: AsyncSession, refresh_token_id: int) -> Session | None:
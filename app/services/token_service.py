@@ -1,13 +1,19 @@
 from __future__ import annotations
 
+import base64
 import hashlib
+import hmac
 import secrets
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Tuple, Optional
+from typing import Any, Dict, NamedTuple, Tuple, Optional
 
 import jwt
+from cryptography.hazmat.primitives import serialization
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import BigInteger, DateTime, Text, cast, event, func, insert, literal, select, true, update
+from sqlalchemy.dialects.postgresql import INET
+from sqlalchemy.orm import aliased
 
 
 from app.models.RefreshToken import RefreshToken
@@ -16,81 +22,87 @@ from app.models.Session import Session
 from app.models.RevokedToken import RevokedToken
 
 from app.services import session_service
+from app.services.role_service import UserAccess, encode_permission_mask
+from app.services.revocation_cache import revocation_cache
 
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.keys import JwtKey, key_manager
 
 ACCESS_TOKEN_EXPIRES_MINUTES = settings.ACCESS_TOKEN_EXPIRES_MINUTES
 REFRESH_TOKEN_EXPIRES_DAYS = settings.REFRESH_TOKEN_EXPIRES_DAYS
 
-def _load_private_key() -> str:
-    """Load private key from settings (inline or file path)."""
-    key = settings.PRIVATE_KEY
-    if key:
-        return key
-    path = settings.PRIVATE_KEY_PATH
-    if path and path.exists():
-        with open(path, 'r', encoding='utf-8') as f:
-            return f.read()
-    raise RuntimeError("PRIVATE_KEY or PRIVATE_KEY_PATH must be set in settings")
-    
-
-def _load_public_key() -> str:
-    key = settings.PUBLIC_KEY
-    if key:
-        return key
-    path = settings.PUBLIC_KEY_PATH
-    if path and path.exists():
-        with open(path, 'r', encoding='utf-8') as f:
-            return f.read()
-    raise RuntimeError("PUBLIC_KEY or PUBLIC_KEY_PATH must be set in settings")
-
-_PRIVATE_KEY = None
-_PUBLIC_KEY = None
-
-def _get_private_key():
-    global _PRIVATE_KEY
-    if _PRIVATE_KEY is None:
-        _PRIVATE_KEY = _load_private_key()
-    return _PRIVATE_KEY
-
-def _get_public_key():
-    global _PUBLIC_KEY
-    if _PUBLIC_KEY is None:
-        _PUBLIC_KEY = _load_public_key()
-    return _PUBLIC_KEY
-
 def _hash_secret(raw: str) -> str:
     return hashlib.sha256(raw.encode()).hexdigest()
 
 def _now_utc()->datetime:
     return datetime.now(timezone.utc)
 
-def verify_access_token(token: str) -> dict:
-    
-    pub = _get_public_key()
-    payload = jwt.decode(token, pub, algorithms=["RS256"], options={"verify_aud": False})
-    return payload
+# sha256(raw token) -> (kid, payload), kept until the token's own `exp`.
+# Clients resend the same bearer token for its whole lifetime, so repeat
+# requests skip signature verification and claim parsing entirely.
+_verified_tokens: TTLCache[bytes, Tuple[Optional[str], Dict[str, Any]]] = TTLCache(
+    maxsize=settings.VERIFIED_TOKEN_CACHE_SIZE,
+)
 
-def create_access_token_for_user(user: User, extra_claims: dict | None =None):
+def verify_access_token(token: str) -> dict:
+    digest = hashlib.sha256(token.encode()).digest()
+    cached = _verified_tokens.get(digest) if _verified_tokens.maxsize else None
+    if cached is not None:
+        kid, payload = cached
+        # A retired signing key invalidates its tokens even while cached.
+        if kid is None or kid in key_manager.ring().keys:
+            return dict(payload)
+        _verified_tokens.pop(digest)
+
+    header = jwt.get_unverified_header(token)
+    kid = header.get("kid")
+    key = key_manager.verification_key(kid)
+    if key is None:
+        raise jwt.InvalidTokenError("Unknown signing key")
+
+    payload = jwt.decode(token, key.public_key, algorithms=[key.algorithm], options={"verify_aud": False})
+
+    exp = payload.get("exp")
+    if _verified_tokens.maxsize and isinstance(exp, (int, float)) and not revocation_cache.is_revoked(payload.get("jti", "")):
+        _verified_tokens.set(digest, (kid, payload), expires_at=exp)
+    return dict(payload)
+
+def evict_verified_token(jti: str) -> int:
+    """Forget cached verifications of the token with `jti`, e.g. once it is revoked."""
+    return _verified_tokens.discard_where(lambda _digest, item: item[1].get("jti") == jti)
+
+def verified_token_cache_stats() -> dict:
+    return _verified_tokens.stats()
+
+def create_access_token_for_user(user: User, extra_claims: dict | None =None, access: UserAccess | None = None):
     """
+    When `access` is given the token carries the user's roles and permission
+    bitmask, so authorization checks need no database lookup.
     """
-    priv = _get_private_key()
+    key = key_manager.signing_key()
     now = _now_utc()
     exp = now + timedelta(minutes=ACCESS_TOKEN_EXPIRES_MINUTES)
     jti = secrets.token_urlsafe(16)
 
     payload = {
+        "iss": settings.jwt_issuer,
         "sub": str(user.id),
         "email": user.email,
         "iat": int(now.timestamp()),
         "exp": int(exp.timestamp()),
         "jti": jti,
+        "token_version": user.token_version,
     }
 
+    if access is not None:
+        payload["roles"] = sorted(access.roles)
+        payload["perms"] = encode_permission_mask(access.permission_ids)
+
     if extra_claims:
         payload.update(extra_claims)
     
-    token = jwt.encode(payload=payload, key=priv, algorithm="RS256")
+    token = jwt.encode(payload=payload, key=key.private_key, algorithm=key.algorithm, headers={"kid": key.kid})
     return token
 
 async def create_refresh_token(
@@ -120,124 +132,408 @@ async def create_refresh_token(
     db.add(rt)
     await db.flush()
 
-    token_str = f"{rt.id}-{user.id}-{raw_secret}"
+    token_str = _format_refresh_token(rt.id, user.id, raw_secret) #type: ignore
 
     return token_str, rt
 
+class IssuedRefreshToken(NamedTuple):
+    token: str
+    refresh_token_id: int
+    session_id: int
+
+async def create_refresh_token_with_session(
+        db: AsyncSession,
+        user: User,
+        user_agent: Optional[str] = None,
+        ip_addr: Optional[str] = None,
+        device_info: Optional[str] = None,
+        expires_days: int = REFRESH_TOKEN_EXPIRES_DAYS
+) -> IssuedRefreshToken:
+    """
+    Insert a refresh token and the session that owns it in one statement,
+    with both ids coming back through RETURNING. Used by login, where
+    `create_refresh_token` + `session_service.create_session` would cost a
+    flush each.
+    """
+    now = _now_utc()
+    raw_secret = secrets.token_urlsafe(48)
+
+    new = (
+        insert(RefreshToken)
+        .values(
+            user_id=user.id,
+            token_hash=_hash_secret(raw_secret),
+            user_agent=user_agent,
+            ip_address=ip_addr,
+            created_at=now,
+            expires_at=now + timedelta(days=expires_days),
+            revoked=False,
+        )
+        .returning(RefreshToken.id)
+        .cte("new_token")
+    )
+    session = (
+        insert(Session)
+        .from_select(
+            ["user_id", "refresh_token_id", "device_info", "last_used_at", "revoked"],
+            select(
+                literal(user.id, BigInteger),
+                new.c.id,
+                literal(device_info, Text),
+                literal(now, DateTime(timezone=True)),
+                literal(False),
+            ),
+        )
+        .returning(Session.id)
+        .cte("new_session")
+    )
+
+    res = await db.execute(select(new.c.id, session.c.id).join_from(new, session, true()))
+    rt_id, session_id = res.one()
+
+    return IssuedRefreshToken(_format_refresh_token(rt_id, user.id, raw_secret), rt_id, session_id) #type: ignore
+
 async def _get_refresh_token_by_id(db: AsyncSession, rt_id: int)-> Optional[RefreshToken]:
     res = await db.execute(select(RefreshToken).where(RefreshToken.id == rt_id))
     return res.scalar_one_or_none()
 
+class RefreshTokenReused(ValueError):
+    """
+    A refresh token that was already rotated was presented with its correct
+    secret. All of the user's sessions have been revoked in the caller's
+    transaction, which it should commit even though the request fails.
+    """
+
 async def verify_refresh_token_and_get_row(db: AsyncSession, token_str: str) -> RefreshToken:
-    try:
-        rt_id, user_id, raw = token_str.split('-', 2)
-        rt_id = int(rt_id)
-        user_id = int(user_id)
-    except Exception:
-        raise ValueError("Invalid refresh token format")
+    rt_id, user_id, raw = _parse_refresh_token(token_str)
     
     rt = await _get_refresh_token_by_id(db, rt_id)
 
-    if not rt:
-        try:
-            await session_service.revoke_all_sessions(db, user_id)
-        except Exception:
-            pass
+    # A wrong id or secret shows nothing about the caller ever holding a
+    # real token, so only a correct secret for a revoked token counts as reuse.
+    if not rt or rt.user_id != user_id or _hash_secret(raw) != rt.token_hash:
         raise ValueError("Invalid refresh token")
     
     if rt.expires_at < _now_utc(): #type:ignore
         raise ValueError("Refresh token expired")
     
     if rt.revoked: #type:ignore
-        try:
+        # Only rotation sets rotated_at. Tokens revoked by logout, session
+        # revocation or eviction are simply dead; replaying them says nothing
+        # about theft of the live token.
+        if rt.rotated_at is not None:
             await session_service.revoke_all_sessions(db, rt.user_id) #type: ignore
-        except Exception:
-            pass
+            raise RefreshTokenReused("Refresh token reused")
         raise ValueError("Refresh token revoked")
     
-    expected_hash = rt.token_hash #type:ignore
+    return rt #type: ignore
 
-    if _hash_secret(raw) != expected_hash:
+class RotatedRefreshToken(NamedTuple):
+    token: str
+    refresh_token_id: int
+    session_id: Optional[int]
+    user: User
+
+# How many rotations a grace-window replay may walk forward (a tab that
+# raced several refreshes in a row).
+_MAX_GRACE_HOPS = 3
+
+# Refresh tokens look like `{id}.{user_id}.{secret}.{pepper_id}.{tag}`. The
+# tag is a truncated HMAC of everything before it under a server-side
+# pepper, so forged or mangled tokens are turned away before any query.
+# Tokens issued before tagging, `{id}-{user_id}-{secret}`, can only be
+# checked against the database.
+_TAG_BYTES = 16
+
+def _configured_peppers() -> Dict[str, bytes]:
+    if settings.REFRESH_TOKEN_PEPPERS:
+        peppers = {pid: secret.encode() for pid, secret in settings.REFRESH_TOKEN_PEPPERS.items()}
+    elif settings.REFRESH_TOKEN_SECRET:
+        peppers = {"0": settings.REFRESH_TOKEN_SECRET.encode()}
+    else:
+        return {}
+
+    for pid, secret in peppers.items():
+        if not pid or "." in pid or not secret:
+            raise ValueError(f"Invalid refresh token pepper {pid!r}")
+    if settings.REFRESH_TOKEN_PEPPER_ID is not None and settings.REFRESH_TOKEN_PEPPER_ID not in peppers:
+        raise ValueError(f"REFRESH_TOKEN_PEPPER_ID {settings.REFRESH_TOKEN_PEPPER_ID!r} is not configured")
+    return peppers
+
+_PEPPERS = _configured_peppers()
+_ACTIVE_PEPPER_ID = settings.REFRESH_TOKEN_PEPPER_ID or next(reversed(_PEPPERS), None)
+
+if not _PEPPERS and settings.APP_ENV != "development":
+    # A derived pepper lives only as long as this process knows the signing
+    # key's private half, far shorter than a refresh token.
+    raise RuntimeError("Set REFRESH_TOKEN_PEPPERS or REFRESH_TOKEN_SECRET outside development")
+
+# kid -> (pepper, monotonic time it was derived). Kept for the refresh token
+# lifetime, so rotating the signing key does not orphan tags made with it.
+_derived_peppers: Dict[str, Tuple[bytes, float]] = {}
+_DERIVED_PEPPER_TTL = REFRESH_TOKEN_EXPIRES_DAYS * 86400
+
+def _derived_pepper(key: JwtKey) -> bytes:
+    entry = _derived_peppers.get(key.kid)
+    if entry is None:
+        material = key.private_key.private_bytes(
+            serialization.Encoding.DER, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        entry = (hashlib.sha256(b"refresh-token-pepper:" + material).digest(), time.monotonic())
+        _derived_peppers[key.kid] = entry
+    return entry[0]
+
+def _active_pepper() -> Tuple[str, bytes]:
+    if _ACTIVE_PEPPER_ID is not None:
+        return _ACTIVE_PEPPER_ID, _PEPPERS[_ACTIVE_PEPPER_ID]
+    # No pepper configured: derive one per signing key, named by its kid.
+    key = key_manager.signing_key()
+    return key.kid, _derived_pepper(key)
+
+def _pepper(pepper_id: str) -> Optional[bytes]:
+    if _PEPPERS:
+        return _PEPPERS.get(pepper_id)
+    entry = _derived_peppers.get(pepper_id)
+    if entry is not None:
+        if time.monotonic() - entry[1] < _DERIVED_PEPPER_TTL:
+            return entry[0]
+        del _derived_peppers[pepper_id]
+    key = key_manager.ring().keys.get(pepper_id)
+    if key is None or key.private_key is None:
+        return None
+    return _derived_pepper(key)
+
+def _tag(pepper: bytes, body: str) -> str:
+    mac = hmac.new(pepper, body.encode(), hashlib.sha256).digest()[:_TAG_BYTES]
+    return base64.urlsafe_b64encode(mac).rstrip(b"=").decode("ascii")
+
+def _format_refresh_token(rt_id: int, user_id: int, raw: str) -> str:
+    pepper_id, pepper = _active_pepper()
+    body = f"{rt_id}.{user_id}.{raw}.{pepper_id}"
+    return f"{body}.{_tag(pepper, body)}"
+
+def _parse_refresh_token(token_str: str) -> Tuple[int, int, str]:
+    """
+    Split a refresh token into (id, user_id, secret). Raises ValueError
+    without any database access unless the tag checks out (or the token is
+    an untagged one and those are still accepted).
+    """
+    parts = token_str.split(".")
+    if len(parts) == 5:
+        rt_id, user_id, raw, pepper_id, tag = parts
+        pepper = _pepper(pepper_id)
+        if pepper is not None:
+            if not hmac.compare_digest(tag, _tag(pepper, token_str[:-len(tag) - 1])):
+                raise ValueError("Invalid refresh token")
+        elif _PEPPERS:
+            raise ValueError("Invalid refresh token")
+        # Otherwise the pepper was derived from a signing key this process
+        # never held (e.g. before a restart); the hash check has to decide.
+    elif len(parts) == 1 and settings.REFRESH_TOKEN_ACCEPT_UNTAGGED:
         try:
-            await session_service.revoke_all_sessions(db, rt.user_id) #type: ignore
-        except Exception:
-            pass
-        raise ValueError("Invalid refresh token")
-    
-    return rt #type: ignore
+            rt_id, user_id, raw = token_str.split("-", 2)
+        except ValueError:
+            raise ValueError("Invalid refresh token format")
+    else:
+        raise ValueError("Invalid refresh token format")
+
+    try:
+        return int(rt_id), int(user_id), raw
+    except ValueError:
+        raise ValueError("Invalid refresh token format")
+
+def _successor_secret(rt_id: int, raw: str) -> str:
+    """
+    Secret of the token that replaces refresh token `rt_id`. Deterministic,
+    so a replay inside the grace window can be handed the same successor
+    without the raw secret ever being stored; keyed, so a stolen token does
+    not reveal the ones after it.
+    """
+    mac = hmac.new(_active_pepper()[1], f"{rt_id}:{raw}".encode(), hashlib.sha384).digest()
+    return base64.urlsafe_b64encode(mac).decode("ascii")
 
 async def rotate_refresh_token(
         db: AsyncSession,
         presented_token: str,
         user_agent: Optional[str] = None,
         ip_addr: Optional[str] = None
-) -> Tuple[str, RefreshToken]:
+) -> RotatedRefreshToken:
     """
+    Revoke the presented refresh token, issue its successor, move the session
+    over to it and load the user, all in one statement:
+
+        WITH old_token AS (UPDATE refresh_tokens ... RETURNING),
+             new_token AS (INSERT ... SELECT FROM old_token RETURNING),
+             rotated_session AS (UPDATE sessions ... RETURNING)
+        SELECT users.*, new_token.id, rotated_session.id ...
+
+    The UPDATE only matches a live token with the right hash, so concurrent
+    rotations of the same token serialize on its row lock and only one wins.
+    The loser gets the winner's successor if it is inside the reuse grace
+    window; anything else falls back to `verify_refresh_token_and_get_row`
+    to work out why (and to handle reuse). Those paths are rare and may
+    query more.
     """
+    rt_id, user_id, raw = _parse_refresh_token(presented_token)
 
-    rt = await verify_refresh_token_and_get_row(db, presented_token)
-
-    user = await db.get(User, rt.user_id)
-
-    if not user:
-        raise ValueError("Invalid refresh token user")
-    
-    new_token_str, new_rt = await create_refresh_token(
-        db, user, user_agent, ip_addr
+    now = _now_utc()
+    raw_secret = _successor_secret(rt_id, raw)
+
+    old = (
+        update(RefreshToken)
+        .where(
+            RefreshToken.id == rt_id,
+            RefreshToken.user_id == user_id,
+            RefreshToken.token_hash == _hash_secret(raw),
+            RefreshToken.revoked.isnot(True),
+            RefreshToken.expires_at > now,
+        )
+        .values(revoked=True, rotated_at=now)
+        .returning(RefreshToken.id, RefreshToken.user_id, RefreshToken.family_id)
+        .cte("old_token")
+    )
+    new = (
+        insert(RefreshToken)
+        .from_select(
+            ["user_id", "family_id", "parent_id", "token_hash", "user_agent", "ip_address",
+             "created_at", "expires_at", "revoked"],
+            select(
+                old.c.user_id,
+                func.coalesce(old.c.family_id, old.c.id),
+                old.c.id,
+                literal(_hash_secret(raw_secret)),
+                literal(user_agent, Text),
+                cast(literal(ip_addr, Text), INET),
+                literal(now, DateTime(timezone=True)),
+                literal(now + timedelta(days=REFRESH_TOKEN_EXPIRES_DAYS), DateTime(timezone=True)),
+                literal(False),
+            ),
+        )
+        .returning(RefreshToken.id, RefreshToken.user_id)
+        .cte("new_token")
+    )
+    moved = (
+        update(Session)
+        .where(Session.refresh_token_id == old.c.id)
+        .values(refresh_token_id=new.c.id, last_used_at=now)
+        .returning(Session.id)
+        .cte("rotated_session")
     )
 
-    rt.revoked = True #type: ignore
+    res = await db.execute(
+        select(User, new.c.id, moved.c.id)
+        .join(new, User.id == new.c.user_id)
+        .outerjoin(moved, true())
+    )
+    row = res.first()
+
+    if row is None:
+        replayed = await _successor_within_grace(db, rt_id, user_id, raw)
+        if replayed is not None:
+            return replayed
+        # Raises for unknown, expired, reused or forged tokens.
+        await verify_refresh_token_and_get_row(db, presented_token)
+        raise ValueError("Invalid refresh token")
 
-    res = await db.execute(select(Session).where(Session.refresh_token_id == rt.id))
-    session_obj = res.scalar_one_or_none()
+    user, new_rt_id, session_id = row
+    return RotatedRefreshToken(_format_refresh_token(new_rt_id, user.id, raw_secret), new_rt_id, session_id, user)
 
-    if session_obj:
-        session_obj.refresh_token_id = new_rt.id
-        session_obj.last_used_at = _now_utc() #type: ignore
-    
-    await db.flush()
+async def _successor_within_grace(
+        db: AsyncSession,
+        rt_id: int,
+        user_id: int,
+        raw: str,
+) -> Optional[RotatedRefreshToken]:
+    """
+    The live successor of refresh token `rt_id`, if `rt_id` was rotated
+    within REFRESH_TOKEN_REUSE_GRACE_SECONDS. A successor whose hash matches
+    the one derived from `raw` proves `raw` was the right secret.
+    """
+    grace = settings.REFRESH_TOKEN_REUSE_GRACE_SECONDS
+    if grace <= 0:
+        return None
 
-    return new_token_str, new_rt
+    now = _now_utc()
+    cutoff = now - timedelta(seconds=grace)
+    parent = aliased(RefreshToken)
+    token_id, secret = rt_id, raw
+
+    for _ in range(_MAX_GRACE_HOPS):
+        secret = _successor_secret(token_id, secret)
+        res = await db.execute(
+            select(RefreshToken, User, Session.id)
+            .join(parent, parent.id == RefreshToken.parent_id)
+            .join(User, User.id == RefreshToken.user_id)
+            .outerjoin(Session, Session.refresh_token_id == RefreshToken.id)
+            .where(
+                RefreshToken.parent_id == token_id,
+                RefreshToken.user_id == user_id,
+                RefreshToken.token_hash == _hash_secret(secret),
+                parent.rotated_at >= cutoff,
+            )
+        )
+        row = res.first()
+        if row is None:
+            return None
+
+        successor, user, session_id = row
+        if not successor.revoked and successor.expires_at > now: #type: ignore
+            return RotatedRefreshToken(_format_refresh_token(successor.id, user.id, secret), successor.id, session_id, user) #type: ignore
+        if successor.rotated_at is None:
+            # Revoked by logout or theft handling, not by another rotation.
+            return None
+        token_id = successor.id #type: ignore
+
+    return None
 
 async def revoke_refresh_token(db: AsyncSession, token_str: str) -> bool:
     """
     """
     try:
-        rt_id_str, _, _ = token_str.split("-", 2)
-        rt_id = int(rt_id_str)
-    except Exception:
+        rt_id, _, raw = _parse_refresh_token(token_str)
+    except ValueError:
         return False
     
     rt = await _get_refresh_token_by_id(db, rt_id)
 
-    if not rt:
+    if not rt or rt.token_hash != _hash_secret(raw):
         return False
     
     rt.revoked = True # type: ignore
 
-    if rt and rt.session:
-        rt.session.revoked = True
-    
+    # Not via `rt.session`: a lazy load cannot run under AsyncSession.
+    await db.execute(
+        update(Session)
+        .where(Session.refresh_token_id == rt.id)
+        .values(revoked=True)
+        .execution_options(synchronize_session=False)
+    )
     await db.flush()
 
     return True
 
 
-async def revoke_all_refresh_tokens_for_user(db: AsyncSession, user_id: int):
-    
-    await db.execute(
-        update(RefreshToken).where(RefreshToken.user_id == user_id).values(revoked=True)
-    )
-    await session_service.revoke_all_sessions(db, user_id)
-    await db.flush()
-    return True
+async def revoke_all_refresh_tokens_for_user(db: AsyncSession, user_id: int) -> session_service.RevokedSessions:
+    return await session_service.revoke_all_sessions(db, user_id)
 
-async def revoke_access_token_jti(db: AsyncSession, jti: str):
+async def revoke_access_token_jti(db: AsyncSession, jti: str, expires_at: Optional[datetime] = None):
 
-    item = RevokedToken(jti=jti)
+    item = RevokedToken(jti=jti, expires_at=expires_at)
     db.add(item)
     await db.flush()
 
+    # Only once the revocation is committed; a rollback must not leave the
+    # token revoked in this worker's caches.
+    def _apply(_session) -> None:
+        revocation_cache.add(jti, expires_at)
+        evict_verified_token(jti)
+
+    event.listen(db.sync_session, "after_commit", _apply, once=True)
+
 async def is_access_token_revoked(db: AsyncSession, jti: str) -> bool:
+    cached = revocation_cache.is_revoked(jti)
+    if cached is not None:
+        return cached
+
     result = await db.execute(select(RevokedToken).where(RevokedToken.jti == jti))
     return result.scalar_one_or_none() is not None
\ No newline at end of file
@@ -2,11 +2,12 @@ from __future__ import annotations
 from typing import Optional, List
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 
 from app.models.User import User
 from app.schemas.user import UserUpdate
-from app.services.auth_service import hash_password
+from app.services.auth_service import hash_password_async
+from app.services.role_service import invalidate_user_access
 
 async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
     return await db.get(User, user_id)
@@ -49,7 +50,7 @@ async def update_user(
         user.email = data.email #type:ignore 
 
     if data.password is not None:
-        user.password_hash = hash_password(data.password) #type: ignore
+        user.password_hash = await hash_password_async(data.password) #type: ignore
 
     if data.is_active is not None:
         user.is_active = data.is_active #type: ignore
@@ -69,6 +70,20 @@ async def hard_delete_user(db: AsyncSession, user_id: int) -> bool:
 
     return True
 
+async def bump_token_version(db: AsyncSession, user_id: int) -> None:
+    """
+    Invalidate every access token issued to the user so far with a single
+    row update: tokens carry `token_version`, and `get_current_user`
+    rejects any that no longer matches the user row it loads anyway.
+    """
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(token_version=User.token_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    invalidate_user_access(db, user_id)
+
 async def require_user(db: AsyncSession, user_id: int) -> User:
     user = await get_user_by_id(db, user_id)
     if not user:
@@ -0,0 +1,78 @@
+"""
+Logins per second through the real `/auth/login` route against the database
+in your settings, plus the number of SQL statements each login and refresh
+sends (via `app.db.instrumentation.count_statements`).
+
+bcrypt dominates login cost; run with e.g. BCRYPT_ROUNDS=4 to see the
+database pipeline on its own. Creates the user `bench-login@example.com`.
+
+    python -m benchmarks.login [logins] [concurrency]
+"""
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+
+import httpx
+
+from app.db.database import async_session
+from app.db.instrumentation import count_statements
+from app.main import app
+from app.schemas.user import UserCreate
+from app.services import auth_service, user_service
+
+EMAIL = "bench-login@example.com"
+PASSWORD = "bench-login-password"
+
+
+async def _ensure_user() -> None:
+    async with async_session() as db:
+        if await user_service.get_user_by_email(db, EMAIL) is None:
+            await auth_service.register_user(db, UserCreate(email=EMAIL, password=PASSWORD))
+            await db.commit()
+
+
+async def main(logins: int = 200, concurrency: int = 8) -> None:
+    await _ensure_user()
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def login() -> dict:
+                res = await client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+                res.raise_for_status()
+                return res.json()
+
+            # Warm the permission cache and connection pool first.
+            tokens = await login()
+
+            with count_statements() as per_login:
+                tokens = await login()
+            with count_statements() as per_refresh:
+                res = await client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+                res.raise_for_status()
+
+            print(f"login:   {per_login.count} statements + {per_login.commits} commit")
+            print(f"refresh: {per_refresh.count} statements + {per_refresh.commits} commit")
+
+            remaining = logins
+
+            async def worker() -> None:
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    await login()
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+
+    print(f"{logins} logins, concurrency {concurrency}: {logins / elapsed:.1f} logins/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+    ))
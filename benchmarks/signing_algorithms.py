@@ -0,0 +1,55 @@
+"""
+Sign and verify throughput per JWT algorithm on this machine, using the same
+parsed-key path as `token_service` (keys wrapped by `app.core.keys.make_key`).
+
+    python -m benchmarks.signing_algorithms [iterations]
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from app.core.keys import make_key
+
+PAYLOAD = {
+    "iss": "https://auth.example.com", "sub": "42", "email": "bench@example.com",
+    "iat": 0, "exp": 2**31 - 1, "jti": "bench", "token_version": 0, "roles": ["user"],
+}
+
+KEYS = {
+    "RS256 (RSA-2048)": lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+    "RS256 (RSA-3072)": lambda: rsa.generate_private_key(public_exponent=65537, key_size=3072),
+    "ES256 (P-256)": lambda: ec.generate_private_key(ec.SECP256R1()),
+    "EdDSA (Ed25519)": ed25519.Ed25519PrivateKey.generate,
+}
+
+
+def _per_second(fn, iterations: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def main(iterations: int = 1000) -> None:
+    print(f"{'algorithm':<18} {'sign/s':>10} {'verify/s':>10} {'token bytes':>12}")
+    for name, generate in KEYS.items():
+        key = make_key(generate())
+        headers = {"kid": key.kid}
+        token = jwt.encode(PAYLOAD, key.private_key, algorithm=key.algorithm, headers=headers)
+
+        sign = _per_second(
+            lambda: jwt.encode(PAYLOAD, key.private_key, algorithm=key.algorithm, headers=headers), iterations
+        )
+        verify = _per_second(
+            lambda: jwt.decode(token, key.public_key, algorithms=[key.algorithm]), iterations
+        )
+        print(f"{name:<18} {sign:10.0f} {verify:10.0f} {len(token):12d}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
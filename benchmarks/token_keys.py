@@ -0,0 +1,68 @@
+"""
+Per-call cost of signing and verifying access tokens with a PEM string
+(re-parsed on every call) versus the parsed keys held by `KeyManager`.
+
+    python -m benchmarks.token_keys [iterations]
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.core.keys import KeyManager
+
+PAYLOAD = {"sub": "42", "email": "bench@example.com", "iat": 0, "exp": 2**31 - 1, "jti": "bench"}
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(iterations: int = 500) -> None:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    ).decode()
+
+    manager = KeyManager(reload_seconds=0)
+    key = manager.rotate(private_key)
+    token = jwt.encode(PAYLOAD, key.private_key, algorithm=key.algorithm)
+
+    results = {
+        "encode (PEM string)": _per_call_us(
+            lambda: jwt.encode(PAYLOAD, private_pem, algorithm="RS256"), iterations
+        ),
+        "encode (KeyManager)": _per_call_us(
+            lambda: jwt.encode(PAYLOAD, manager.signing_key().private_key, algorithm="RS256",
+                               headers={"kid": key.kid}),
+            iterations,
+        ),
+        "decode (PEM string)": _per_call_us(
+            lambda: jwt.decode(token, public_pem, algorithms=["RS256"]), iterations
+        ),
+        "decode (KeyManager)": _per_call_us(
+            lambda: jwt.decode(token, manager.verification_key(key.kid).public_key, algorithms=["RS256"]),
+            iterations,
+        ),
+    }
+
+    for name, us in results.items():
+        print(f"{name:<22} {us:10.1f} us/call")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,70 @@
+"""
+Verifications per second on one core for `app.client.TokenVerifier`, with the
+JWKS and a revocation set already cached (the steady state of a resource
+server), next to a bare `jwt.decode` with the key already in hand.
+
+    python -m benchmarks.verifier [iterations] [revoked]
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import secrets
+import sys
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.client import TokenVerifier
+from app.core.keys import KeyManager, build_jwks
+
+ISSUER = "https://auth.example.com"
+
+
+def _per_second(fn, iterations: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def main(iterations: int = 5000, revoked: int = 100_000) -> None:
+    manager = KeyManager(reload_seconds=0)
+    key = manager.rotate(rsa.generate_private_key(public_exponent=65537, key_size=2048))
+
+    now = int(time.time())
+    payload = {"iss": ISSUER, "sub": "42", "email": "bench@example.com", "iat": now,
+               "exp": now + 900, "jti": secrets.token_urlsafe(16), "roles": ["user"]}
+    token = jwt.encode(payload, key.private_key, algorithm=key.algorithm, headers={"kid": key.kid})
+
+    verifier = TokenVerifier(ISSUER, revocations_url=f"{ISSUER}/revocations")
+    verifier.load_jwks(json.loads(build_jwks(manager.ring()).body))
+    verifier.add_revocations((secrets.token_urlsafe(16), now + 900) for _ in range(revoked))
+    verifier._revocations_synced_at = time.monotonic()
+
+    async def _async_rate() -> float:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await verifier.verify(token)
+        return iterations / (time.perf_counter() - start)
+
+    results = {
+        "TokenVerifier.decode": _per_second(lambda: verifier.decode(token), iterations),
+        "TokenVerifier.verify (async)": asyncio.run(_async_rate()),
+        "jwt.decode only (baseline)": _per_second(
+            lambda: jwt.decode(token, key.public_key, algorithms=[key.algorithm], issuer=ISSUER), iterations
+        ),
+    }
+
+    print(f"RS256, {revoked} cached revocations, 1 core")
+    for name, rate in results.items():
+        print(f"{name:<30} {rate:10.0f} verifications/s  ({1e6 / rate:7.1f} us)")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100_000,
+    )
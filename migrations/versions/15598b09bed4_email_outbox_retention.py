@@ -0,0 +1,40 @@
+"""email outbox retention
+
+Revision ID: 15598b09bed4
+Revises: f44b8363c5f8
+Create Date: 2025-12-19 09:52:13.640218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '15598b09bed4'
+down_revision: Union[str, Sequence[str], None] = 'f44b8363c5f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Finished rows no longer need their body, which holds one-time links.
+    op.execute("UPDATE email_outbox SET html_content = '' WHERE status IN ('sent', 'dead') AND html_content <> ''")
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_email_outbox_finished', 'email_outbox', ['next_attempt_at'], unique=False,
+            postgresql_where=sa.text("status IN ('sent', 'dead')"),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_email_outbox_finished', table_name='email_outbox',
+            postgresql_concurrently=True, if_exists=True,
+        )
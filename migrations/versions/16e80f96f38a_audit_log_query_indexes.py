@@ -0,0 +1,78 @@
+"""audit log query indexes
+
+Revision ID: 16e80f96f38a
+Revises: ce445e11e375
+Create Date: 2025-12-08 10:41:52.204117
+
+"""
+from typing import Dict, List, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '16e80f96f38a'
+down_revision: Union[str, Sequence[str], None] = 'ce445e11e375'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PARENT_TABLE = 'audit_logs'
+
+# name -> index definition after `ON <table>`
+INDEXES = {
+    'ix_audit_logs_created_at_id': '(created_at, id)',
+    'ix_audit_logs_user_id_created_at_id': '(user_id, created_at, id)',
+    'ix_audit_logs_action_type_created_at_id': '(action_type, created_at, id)',
+    'ix_audit_logs_ip_address_created_at_id': '(ip_address, created_at, id) WHERE ip_address IS NOT NULL',
+    'ix_audit_logs_metadata': 'USING gin (metadata)',
+}
+OLD_INDEX = ('ix_audit_logs_user_id_created_at', '(user_id, created_at)')
+
+
+def _partitions() -> List[str]:
+    # Every attached partition, including audit_logs_legacy from the
+    # partitioning migration.
+    res = op.get_bind().execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:parent AS regclass) ORDER BY c.relname"
+    ), {'parent': PARENT_TABLE})
+    return [name for (name,) in res]
+
+
+def _create_partitioned_indexes(indexes: Dict[str, str]) -> None:
+    """
+    A plain CREATE INDEX on a partitioned table holds a SHARE lock on every
+    partition until all of them are built, blocking audit writes. Instead
+    the parent index is created ON ONLY the parent (invalid, no scan), each
+    partition's index is built CONCURRENTLY and then attached; the parent
+    index turns valid once every partition has one. Partitions created
+    meanwhile get their copy automatically. A failed concurrent build
+    leaves an INVALID index behind: drop it before rerunning.
+    """
+    for name, definition in indexes.items():
+        op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON ONLY {PARENT_TABLE} {definition}')
+
+    with op.get_context().autocommit_block():
+        for partition in _partitions():
+            for name, definition in indexes.items():
+                partition_index = f'{partition}_{name.removeprefix("ix_audit_logs_")}'
+                op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} ON {partition} {definition}')
+                # A no-op when the partition's index is already attached.
+                op.execute(f'ALTER INDEX {name} ATTACH PARTITION {partition_index}')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _create_partitioned_indexes(INDEXES)
+    # Superseded by ix_audit_logs_user_id_created_at_id. Dropping needs a
+    # brief exclusive lock but no scan.
+    op.drop_index(OLD_INDEX[0], table_name=PARENT_TABLE, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _create_partitioned_indexes(dict([OLD_INDEX]))
+    for name in reversed(list(INDEXES)):
+        op.drop_index(name, table_name=PARENT_TABLE, if_exists=True)
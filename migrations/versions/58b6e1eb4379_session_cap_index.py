@@ -0,0 +1,36 @@
+"""session cap index
+
+Revision ID: 58b6e1eb4379
+Revises: adfa5beef568
+Create Date: 2025-12-17 14:03:27.519804
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '58b6e1eb4379'
+down_revision: Union[str, Sequence[str], None] = 'adfa5beef568'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_sessions_user_id_live_last_used_at', 'sessions', ['user_id', 'last_used_at', 'id'], unique=False,
+            postgresql_where=sa.text('revoked IS NOT TRUE'), postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_sessions_user_id_live_last_used_at', table_name='sessions',
+            postgresql_concurrently=True, if_exists=True,
+        )
@@ -0,0 +1,30 @@
+"""revoked token expiry
+
+Revision ID: 7977b346cbe8
+Revises: dd9e86f763e9
+Create Date: 2025-11-24 10:12:31.184520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7977b346cbe8'
+down_revision: Union[str, Sequence[str], None] = 'dd9e86f763e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('revoked_tokens', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_revoked_tokens_revoked_at', 'revoked_tokens', ['revoked_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_revoked_tokens_revoked_at', table_name='revoked_tokens')
+    op.drop_column('revoked_tokens', 'expires_at')
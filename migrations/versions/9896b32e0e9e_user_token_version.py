@@ -0,0 +1,28 @@
+"""user token version
+
+Revision ID: 9896b32e0e9e
+Revises: 7977b346cbe8
+Create Date: 2025-11-26 18:03:52.660214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9896b32e0e9e'
+down_revision: Union[str, Sequence[str], None] = '7977b346cbe8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,56 @@
+"""hot path indexes
+
+Revision ID: adfa5beef568
+Revises: ee024b1356e2
+Create Date: 2025-12-16 09:12:05.418327
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'adfa5beef568'
+down_revision: Union[str, Sequence[str], None] = 'ee024b1356e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built CONCURRENTLY so logins and refreshes keep writing while they
+    # build; that cannot happen inside a transaction. A failed concurrent
+    # build leaves an INVALID index behind: drop it before rerunning.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_refresh_tokens_user_id_live', 'refresh_tokens', ['user_id'], unique=False,
+            postgresql_where=sa.text('revoked IS NOT TRUE'), postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_sessions_user_id_last_used_at', 'sessions', ['user_id', 'last_used_at'], unique=False,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_email_verification_tokens_token_hash', 'email_verification_tokens', ['token_hash'], unique=True,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_password_reset_tokens_token_hash', 'password_reset_tokens', ['token_hash'], unique=True,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_user_roles_role_id_user_id', 'user_roles', ['role_id', 'user_id'], unique=False,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_user_roles_role_id_user_id', table_name='user_roles', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_password_reset_tokens_token_hash', table_name='password_reset_tokens', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_email_verification_tokens_token_hash', table_name='email_verification_tokens', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_sessions_user_id_last_used_at', table_name='sessions', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_refresh_tokens_user_id_live', table_name='refresh_tokens', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,37 @@
+"""revoked token feed cursor
+
+Revision ID: b98096416166
+Revises: 16e80f96f38a
+Create Date: 2025-12-10 16:03:27.918346
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b98096416166'
+down_revision: Union[str, Sequence[str], None] = '16e80f96f38a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows get this migration's transaction id and identity values
+    # in physical order; both are fine as a starting point for the feed.
+    op.add_column('revoked_tokens', sa.Column(
+        'txid', sa.BigInteger(), nullable=False,
+        server_default=sa.text("(pg_current_xact_id()::text)::bigint"),
+    ))
+    op.add_column('revoked_tokens', sa.Column('seq', sa.BigInteger(), sa.Identity(), nullable=False))
+    op.create_index('ix_revoked_tokens_txid_seq', 'revoked_tokens', ['txid', 'seq'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_revoked_tokens_txid_seq', table_name='revoked_tokens')
+    op.drop_column('revoked_tokens', 'seq')
+    op.drop_column('revoked_tokens', 'txid')
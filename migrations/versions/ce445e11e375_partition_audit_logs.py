@@ -0,0 +1,107 @@
+"""partition audit_logs by created_at
+
+Revision ID: ce445e11e375
+Revises: 17be6d66a6f0
+Create Date: 2025-12-05 14:27:09.512873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ce445e11e375'
+down_revision: Union[str, Sequence[str], None] = '17be6d66a6f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Monthly partitions created ahead of time; the app keeps extending this.
+PARTITIONS_AHEAD = 3
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The existing heap becomes the first partition (everything before next
+    # month) instead of being copied row by row.
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_legacy")
+    op.execute("ALTER TABLE audit_logs_legacy DROP CONSTRAINT audit_logs_pkey")
+    op.execute("ALTER TABLE audit_logs_legacy ALTER COLUMN id DROP DEFAULT")
+    op.execute("UPDATE audit_logs_legacy SET created_at = now() WHERE created_at IS NULL")
+    op.execute("ALTER TABLE audit_logs_legacy ALTER COLUMN created_at SET NOT NULL")
+    op.execute("ALTER TABLE audit_logs_legacy ADD CONSTRAINT audit_logs_legacy_pkey PRIMARY KEY (id, created_at)")
+
+    op.execute("""
+        CREATE TABLE audit_logs (
+            id BIGINT NOT NULL DEFAULT nextval('audit_logs_id_seq'),
+            user_id BIGINT REFERENCES users (id),
+            action_type audit_action_enum NOT NULL,
+            metadata JSONB,
+            ip_address INET,
+            user_agent TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            CONSTRAINT audit_logs_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id")
+
+    op.execute(f"""
+        DO $$
+        DECLARE
+            -- Month arithmetic on UTC wall-clock timestamps, so the session
+            -- TimeZone cannot shift the bounds.
+            base timestamp := date_trunc('month', now() AT TIME ZONE 'UTC');
+            bound timestamptz := (base + interval '1 month') AT TIME ZONE 'UTC';
+            part_start timestamp;
+        BEGIN
+            -- Validated up front so ATTACH PARTITION can skip its own scan.
+            EXECUTE format(
+                'ALTER TABLE audit_logs_legacy ADD CONSTRAINT audit_logs_legacy_bound CHECK (created_at < %L)',
+                bound
+            );
+            EXECUTE format(
+                'ALTER TABLE audit_logs ATTACH PARTITION audit_logs_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+                bound
+            );
+            ALTER TABLE audit_logs_legacy DROP CONSTRAINT audit_logs_legacy_bound;
+
+            FOR i IN 0..{PARTITIONS_AHEAD - 1} LOOP
+                part_start := base + make_interval(months => i + 1);
+                EXECUTE format(
+                    'CREATE TABLE audit_logs_p%s PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+                    to_char(part_start, 'YYYYMM'),
+                    part_start AT TIME ZONE 'UTC',
+                    (part_start + interval '1 month') AT TIME ZONE 'UTC'
+                );
+            END LOOP;
+        END $$;
+    """)
+
+    op.create_index('ix_audit_logs_user_id_created_at', 'audit_logs', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE audit_logs RENAME TO audit_logs_partitioned")
+    op.execute("ALTER INDEX audit_logs_pkey RENAME TO audit_logs_partitioned_pkey")
+    op.execute("ALTER TABLE audit_logs_partitioned ALTER COLUMN id DROP DEFAULT")
+    op.create_table('audit_logs',
+    sa.Column('id', sa.BigInteger(), server_default=sa.text("nextval('audit_logs_id_seq')"), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=True),
+    sa.Column('action_type', postgresql.ENUM(name='audit_action_enum', create_type=False), nullable=False),
+    sa.Column('metadata', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('ip_address', postgresql.INET(), nullable=True),
+    sa.Column('user_agent', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("""
+        INSERT INTO audit_logs (id, user_id, action_type, metadata, ip_address, user_agent, created_at)
+        SELECT id, user_id, action_type, metadata, ip_address, user_agent, created_at
+        FROM audit_logs_partitioned
+    """)
+    op.execute("ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id")
+    op.execute("DROP TABLE audit_logs_partitioned CASCADE")
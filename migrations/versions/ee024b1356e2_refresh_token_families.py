@@ -0,0 +1,39 @@
+"""refresh token families
+
+Revision ID: ee024b1356e2
+Revises: b98096416166
+Create Date: 2025-12-15 11:26:40.733961
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ee024b1356e2'
+down_revision: Union[str, Sequence[str], None] = 'b98096416166'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('refresh_tokens', sa.Column('family_id', sa.BigInteger(), nullable=True))
+    op.add_column('refresh_tokens', sa.Column('parent_id', sa.BigInteger(), nullable=True))
+    op.add_column('refresh_tokens', sa.Column('rotated_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_foreign_key(
+        'refresh_tokens_parent_id_fkey', 'refresh_tokens', 'refresh_tokens',
+        ['parent_id'], ['id'], ondelete='SET NULL',
+    )
+    op.create_index('ix_refresh_tokens_parent_id', 'refresh_tokens', ['parent_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_refresh_tokens_parent_id', table_name='refresh_tokens')
+    op.drop_constraint('refresh_tokens_parent_id_fkey', 'refresh_tokens', type_='foreignkey')
+    op.drop_column('refresh_tokens', 'rotated_at')
+    op.drop_column('refresh_tokens', 'parent_id')
+    op.drop_column('refresh_tokens', 'family_id')
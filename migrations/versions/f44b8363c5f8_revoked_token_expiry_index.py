@@ -0,0 +1,36 @@
+"""revoked token expiry index
+
+Revision ID: f44b8363c5f8
+Revises: 58b6e1eb4379
+Create Date: 2025-12-18 10:21:44.306112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f44b8363c5f8'
+down_revision: Union[str, Sequence[str], None] = '58b6e1eb4379'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'], unique=False,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_revoked_tokens_expires_at', table_name='revoked_tokens',
+            postgresql_concurrently=True, if_exists=True,
+        )
@@ -0,0 +1,56 @@
+"""
+Shared fixtures for tests that need PostgreSQL.
+
+Point TEST_DATABASE_URL (a `postgresql+psycopg://` URL) at a database that
+is migrated to head; tests marked `requires_db` are skipped when it is
+unset. Every test runs inside one transaction that is rolled back at the
+end, so service commits become savepoint releases and nothing survives.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
+
+# Settings need a base URL to load; the rest (keys, peppers) comes from .env.
+os.environ.setdefault("APP_BASE_URL", "http://localhost:8000")
+
+from app.models.User import User  # noqa: E402
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+requires_db = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+DbTest = Callable[[AsyncConnection, AsyncSession], Awaitable[Any]]
+
+
+async def _run_in_rollback(test: DbTest) -> Any:
+    engine = create_async_engine(TEST_DATABASE_URL)  # type: ignore[arg-type]
+    try:
+        async with engine.connect() as conn:
+            outer = await conn.begin()
+            db = AsyncSession(bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False)
+            try:
+                return await test(conn, db)
+            finally:
+                await db.close()
+                await outer.rollback()
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture
+def in_rollback() -> Callable[[DbTest], Any]:
+    """Run `async def test(conn, db)` against the test database and roll it back."""
+    return lambda test: asyncio.run(_run_in_rollback(test))
+
+
+async def seed_user(db: AsyncSession, email: str) -> User:
+    """Add an active, verified user inside the test transaction."""
+    user = User(email=email, password_hash=f"hash-{email}", is_active=True, is_verified=True)
+    db.add(user)
+    await db.flush()
+    return user
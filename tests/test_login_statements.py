@@ -0,0 +1,28 @@
+from app.db.instrumentation import count_statements
+from app.models.AuditAction import AuditAction
+from app.services import audit_service, session_service, token_service
+
+from tests.conftest import requires_db, seed_user
+
+
+@requires_db
+def test_login_writes_session_in_two_statements(in_rollback):
+    async def test(conn, db):
+        user = await seed_user(db, "login-budget@example.com")
+        for _ in range(2):
+            await token_service.create_refresh_token_with_session(db, user)
+
+        # The writes /auth/login makes after the password check; the audit
+        # row goes through the batch writer after commit.
+        with count_statements() as counter:
+            issued = await token_service.create_refresh_token_with_session(db, user)
+            evicted = await session_service.evict_excess_sessions(db, user.id, keep=2)
+            await audit_service.log_action(
+                db, user_id=user.id, action_type=AuditAction.LOGIN_SUCCESS,
+                metadata={"session_id": issued.session_id, "evicted_sessions": evicted},
+            )
+
+        assert counter.count <= 2, counter.statements
+        assert evicted == 1
+
+    in_rollback(test)
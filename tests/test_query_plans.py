@@ -0,0 +1,431 @@
+"""
+EXPLAIN every statement the services send and fail if any of them plans a
+sequential scan of a table that grows with traffic.
+
+Seeds QUERY_PLAN_USERS (default 20,000) synthetic users with refresh tokens,
+sessions, email and reset tokens, roles, audit rows, outbox rows and
+revocations, runs each service call under `count_statements()` to record
+exactly what it sends and EXPLAINs those statements with the same
+parameters. Everything is rolled back at the end.
+
+`test_every_service_query_has_a_scenario` needs no database: it fails when
+a public async function in `app.services` has neither a scenario here nor
+an entry in NOT_QUERIED saying why it has none.
+"""
+from __future__ import annotations
+
+import importlib
+import inspect
+import json
+import os
+import pkgutil
+import secrets
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterator, List, NamedTuple, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+import app.services
+from app.db.instrumentation import count_statements
+from app.models.AuditAction import AuditAction
+from app.schemas.password import PasswordResetConfirm
+from app.schemas.permission import PermissionBase
+from app.schemas.role import RoleCreate
+from app.schemas.user import UserCreate, UserUpdate
+from app.services import (
+    audit_partition_service,
+    audit_service,
+    auth_service,
+    email_service,
+    revocation_feed,
+    role_service,
+    session_service,
+    token_service,
+    user_service,
+)
+from app.services.email_dispatcher import email_dispatcher
+from app.services.revocation_cache import RevocationCache
+
+from tests.conftest import requires_db
+
+USERS = int(os.getenv("QUERY_PLAN_USERS", "20000"))
+
+HOT_TABLES = frozenset({
+    "users",
+    "refresh_tokens",
+    "sessions",
+    "email_verification_tokens",
+    "password_reset_tokens",
+    "user_roles",
+    "audit_logs",
+    "revoked_tokens",
+    "email_outbox",
+})
+
+# Scenario -> (tables it may scan, why that is fine)
+ALLOWED_SEQ_SCANS: Dict[str, Tuple[FrozenSet[str], str]] = {
+    "user_service.list_users": (
+        frozenset({"users"}), "the admin listing returns every user",
+    ),
+    "revocation_cache.RevocationCache.refresh (full reload)": (
+        frozenset({"revoked_tokens"}), "a full reload reads every live revocation",
+    ),
+    "user_service.hard_delete_user": (
+        frozenset({"refresh_tokens", "email_verification_tokens", "password_reset_tokens"}),
+        "admin-only; loads all of one user's tokens, including revoked and used ones",
+    ),
+}
+
+# Public async service functions that need no scenario
+NOT_QUERIED: Dict[str, str] = {
+    "audit_partition_service.list_partitions": "catalog query on pg_inherits",
+    "audit_partition_service.ensure_partitions": "partition DDL",
+    "audit_partition_service.drop_expired_partitions": "partition DDL",
+    "audit_partition_service.run_maintenance": "partition DDL under an advisory lock",
+    "audit_partition_service.run": "loop around run_maintenance",
+    "auth_service.hash_password_async": "no SQL",
+    "auth_service.verify_password_async": "no SQL",
+    "email_dispatcher.SmtpConnectionPool.acquire": "SMTP only",
+    "email_dispatcher.SmtpConnectionPool.release": "SMTP only",
+    "email_dispatcher.SmtpConnectionPool.close": "SMTP only",
+    "email_dispatcher.EmailDispatcher.run": "loop around dispatch_once",
+    "session_service.SessionActivity.run": "loop around flush",
+    "revocation_cache.RevocationCache.run": "loop around refresh",
+}
+
+# Every row is tagged so lookups below can find the seeded data among
+# whatever the database already holds.
+SEED = [
+    """
+    INSERT INTO users (email, password_hash, is_active, is_verified, token_version)
+    SELECT 'plan-' || g || '@example.com', 'plan-hash-' || g, true, true, 0
+    FROM generate_series(1, :users) g
+    """,
+    # Five tokens per user; all but the newest were revoked by rotation.
+    """
+    INSERT INTO refresh_tokens (user_id, token_hash, created_at, expires_at, revoked, rotated_at)
+    SELECT u.id, encode(sha256(convert_to('plan-rt-' || u.id || '-' || g, 'UTF8')), 'hex'),
+           now() - (5 - g) * interval '1 day', now() + interval '30 days', g < 5,
+           CASE WHEN g < 5 THEN now() - (4 - g) * interval '1 day' END
+    FROM users u CROSS JOIN generate_series(1, 5) g
+    WHERE u.email LIKE 'plan-%@example.com'
+    """,
+    """
+    INSERT INTO sessions (user_id, refresh_token_id, last_used_at, revoked)
+    SELECT rt.user_id, rt.id, rt.created_at + random() * interval '1 day', rt.revoked
+    FROM refresh_tokens rt JOIN users u ON u.id = rt.user_id
+    WHERE u.email LIKE 'plan-%@example.com'
+    """,
+    """
+    INSERT INTO email_verification_tokens (user_id, token_hash, expires_at, used)
+    SELECT u.id, encode(sha256(convert_to('plan-email-' || u.id, 'UTF8')), 'hex'), now() + interval '1 day', false
+    FROM users u WHERE u.email LIKE 'plan-%@example.com'
+    """,
+    """
+    INSERT INTO password_reset_tokens (user_id, token_hash, expires_at, used)
+    SELECT u.id, encode(sha256(convert_to('plan-reset-' || u.id, 'UTF8')), 'hex'), now() + interval '1 hour', false
+    FROM users u WHERE u.email LIKE 'plan-%@example.com'
+    """,
+    """
+    INSERT INTO roles (name) VALUES ('plan-role-' || md5(random()::text))
+    """,
+    """
+    INSERT INTO user_roles (user_id, role_id)
+    SELECT u.id, (SELECT max(id) FROM roles WHERE name LIKE 'plan-role-%')
+    FROM users u WHERE u.email LIKE 'plan-%@example.com' AND u.id % 1000 = 0
+    """,
+    """
+    INSERT INTO audit_logs (user_id, action_type, metadata, ip_address, created_at)
+    SELECT u.id, 'LOGIN_SUCCESS', '{}'::jsonb, '10.0.0.1'::inet, now() - g * interval '1 minute'
+    FROM users u CROSS JOIN generate_series(1, 10) g
+    WHERE u.email LIKE 'plan-%@example.com'
+    """,
+    # Mostly delivered mail, a few rows due now.
+    """
+    INSERT INTO email_outbox (to_email, subject, html_content, status, next_attempt_at)
+    SELECT u.email, 'plan', '<p>plan</p>', CASE WHEN u.id % 500 = 0 THEN 'pending' ELSE 'sent' END,
+           now() - interval '1 minute'
+    FROM users u WHERE u.email LIKE 'plan-%@example.com'
+    """,
+    """
+    INSERT INTO revoked_tokens (jti, expires_at)
+    SELECT 'plan-jti-' || g, now() + interval '15 minutes' FROM generate_series(1, :users) g
+    """,
+]
+
+
+class Scenario(NamedTuple):
+    # "module.function" or "module.Class.method", optionally followed by a
+    # parenthesised detail when one function has several scenarios
+    name: str
+    call: Callable[[AsyncSession], Awaitable[Any]]
+
+    @property
+    def covers(self) -> str:
+        return self.name.split(" ", 1)[0]
+
+
+def _session_factory(db: AsyncSession):
+    """Hand the test session to code that opens its own, e.g. background writers."""
+    @asynccontextmanager
+    async def session():
+        yield db
+    return session
+
+
+async def _seed(conn: AsyncConnection, db: AsyncSession) -> Dict[str, Any]:
+    # Partitions for the current month, in case maintenance has not run yet.
+    await audit_partition_service.ensure_partitions(db)
+    for statement in SEED:
+        await conn.execute(text(statement), {"users": USERS})
+    for table in sorted(HOT_TABLES) + ["roles"]:
+        await conn.execute(text(f"ANALYZE {table}"))
+
+    user_id, other_user_id, victim_id = (await conn.execute(text(
+        "SELECT id FROM users WHERE email LIKE 'plan-%@example.com' ORDER BY id LIMIT 3"
+    ))).scalars().all()
+    live = (await conn.execute(text(
+        "SELECT rt.id, s.id FROM refresh_tokens rt JOIN sessions s ON s.refresh_token_id = rt.id "
+        "WHERE rt.user_id = :uid AND NOT rt.revoked"
+    ), {"uid": user_id})).one()
+    role_id = (await conn.execute(text("SELECT max(id) FROM roles WHERE name LIKE 'plan-role-%'"))).scalar_one()
+
+    return {
+        "user_id": user_id,
+        "other_user_id": other_user_id,
+        "victim_id": victim_id,
+        "email": f"plan-{USERS // 2}@example.com",
+        "refresh_token": token_service._format_refresh_token(live[0], user_id, f"plan-rt-{user_id}-5"),
+        "refresh_token_id": live[0],
+        "session_id": live[1],
+        "role_id": role_id,
+    }
+
+
+def _scenarios(data: Dict[str, Any]) -> List[Scenario]:
+    uid, other, victim = data["user_id"], data["other_user_id"], data["victim_id"]
+    tag = secrets.token_hex(4)
+    state: Dict[str, Any] = {}
+
+    async def user(db: AsyncSession, user_id: int = uid):
+        return await user_service.get_user_by_id(db, user_id)
+
+    async def register(db):
+        await auth_service.register_user(db, UserCreate(email=f"plan-new-{tag}@example.com", password="plan-password"))
+
+    async def create_role(db):
+        state["role"] = await role_service.create_role(db, RoleCreate(name=f"plan-role-new-{tag}"))
+
+    async def create_permission(db):
+        state["permission"] = await role_service.create_permission(db, PermissionBase(name=f"plan-perm-{tag}"))
+
+    async def create_refresh_token(db):
+        _, state["refresh_token"] = await token_service.create_refresh_token(db, await user(db))
+
+    async def create_refresh_token_with_session(db):
+        state["issued"] = await token_service.create_refresh_token_with_session(db, await user(db))
+
+    async def claim(db):
+        state["claimed"] = await email_dispatcher._claim(db)
+
+    async def record(db):
+        outcomes = [email_dispatcher._outcome(row, None) for row in state["claimed"]]
+        if outcomes:
+            await email_dispatcher._record(db, outcomes)
+
+    async def activity_flush(db):
+        session_service.session_activity.touch(data["session_id"], datetime.now(timezone.utc))
+        await session_service.session_activity.flush(_session_factory(db))
+
+    async def audit_batch(db):
+        rows = [dict(user_id=uid, action_type=AuditAction.LOGIN_SUCCESS, metadata_={}, ip_address="10.0.0.1",
+                     user_agent=None, created_at=datetime.now(timezone.utc)) for _ in range(10)]
+        await audit_service.audit_writer._write(_session_factory(db), rows)
+
+    cache = RevocationCache()
+
+    return [
+        Scenario("user_service.get_user_by_email", lambda db: user_service.get_user_by_email(db, data["email"])),
+        Scenario("user_service.get_user_by_id", lambda db: user_service.get_user_by_id(db, uid)),
+        Scenario("user_service.require_user", lambda db: user_service.require_user(db, other)),
+        Scenario("user_service.list_users", user_service.list_users),
+        Scenario("user_service.deactivate_user", lambda db: user_service.deactivate_user(db, other)),
+        Scenario("user_service.activate_user", lambda db: user_service.activate_user(db, other)),
+        Scenario("user_service.update_user", lambda db: _then(user(db, other), lambda u: user_service.update_user(
+            db, u, UserUpdate(is_active=True)))),
+        Scenario("user_service.bump_token_version", lambda db: user_service.bump_token_version(db, uid)),
+
+        Scenario("auth_service.register_user", register),
+        Scenario("auth_service.authenticate_user", lambda db: auth_service.authenticate_user(
+            db, f"plan-new-{tag}@example.com", "plan-password")),
+        Scenario("auth_service.rehash_password", lambda db: auth_service.rehash_password(
+            _session_factory(db), uid, "plan-password", "plan-hash-1")),
+        Scenario("auth_service.create_email_verification_token", lambda db: _then(
+            user(db), lambda u: auth_service.create_email_verification_token(db, u))),
+        Scenario("auth_service.create_password_reset_token", lambda db: _then(
+            user(db), lambda u: auth_service.create_password_reset_token(db, u))),
+        Scenario("auth_service.verify_email_token", lambda db: auth_service.verify_email_token(db, f"plan-email-{uid}")),
+        Scenario("auth_service.reset_password", lambda db: auth_service.reset_password(
+            db, PasswordResetConfirm(token=f"plan-reset-{uid}", new_password="plan-new-password"))),
+
+        Scenario("email_service.enqueue_email", lambda db: email_service.enqueue_email(
+            db, data["email"], "plan", "<p>plan</p>")),
+        Scenario("email_service.send_verification_email", lambda db: _then(
+            user(db), lambda u: email_service.send_verification_email(db, u, "plan-raw"))),
+        Scenario("email_service.send_password_reset_email", lambda db: _then(
+            user(db), lambda u: email_service.send_password_reset_email(db, u, "plan-raw"))),
+        Scenario("email_service.send_generic_email", lambda db: email_service.send_generic_email(
+            db, data["email"], "plan", "<p>plan</p>")),
+        Scenario("email_dispatcher.EmailDispatcher.dispatch_once (claim)", claim),
+        Scenario("email_dispatcher.EmailDispatcher.dispatch_once (record)", record),
+        Scenario("email_dispatcher.EmailDispatcher.purge_delivered", email_dispatcher.purge_delivered),
+
+        Scenario("role_service.create_role", create_role),
+        Scenario("role_service.get_role_by_id", lambda db: role_service.get_role_by_id(db, data["role_id"])),
+        Scenario("role_service.get_role_by_name", lambda db: role_service.get_role_by_name(db, f"plan-role-new-{tag}")),
+        Scenario("role_service.list_roles", role_service.list_roles),
+        Scenario("role_service.create_permission", create_permission),
+        Scenario("role_service.get_permission_by_id", lambda db: role_service.get_permission_by_id(
+            db, state["permission"].id)),
+        Scenario("role_service.list_permissions", role_service.list_permissions),
+        Scenario("role_service.get_permission_mask", lambda db: role_service.get_permission_mask(
+            db, [f"plan-perm-{tag}", f"plan-missing-{tag}"])),
+        Scenario("role_service.assign_permission_to_role", lambda db: role_service.assign_permission_to_role(
+            db, state["role"], state["permission"])),
+        Scenario("role_service.get_role_permissions", lambda db: role_service.get_role_permissions(db, state["role"].id)),
+        Scenario("role_service.assign_role_to_user", lambda db: _then(
+            user(db), lambda u: role_service.assign_role_to_user(db, u, state["role"]))),
+        Scenario("role_service.get_user_roles", lambda db: role_service.get_user_roles(db, uid)),
+        Scenario("role_service.resolve_user_access", lambda db: role_service.resolve_user_access(db, uid, token_version=-1)),
+        Scenario("role_service.get_user_permissions", lambda db: role_service.get_user_permissions(db, other)),
+        Scenario("role_service.remove_permission_from_role", lambda db: role_service.remove_permission_from_role(
+            db, state["role"], state["permission"])),
+        Scenario("role_service.remove_role_from_user", lambda db: _then(
+            user(db), lambda u: role_service.remove_role_from_user(db, u, state["role"]))),
+        Scenario("role_service.delete_role", lambda db: role_service.delete_role(db, data["role_id"])),
+
+        Scenario("session_service.get_user_sessions", lambda db: session_service.get_user_sessions(db, uid)),
+        Scenario("session_service.get_session_by_refresh_token", lambda db: session_service.get_session_by_refresh_token(
+            db, data["refresh_token_id"])),
+        Scenario("session_service.SessionActivity.flush", activity_flush),
+        Scenario("token_service.create_refresh_token", create_refresh_token),
+        Scenario("session_service.create_session", lambda db: _then(
+            user(db), lambda u: session_service.create_session(db, u, state["refresh_token"]))),
+        Scenario("token_service.create_refresh_token_with_session", create_refresh_token_with_session),
+        Scenario("token_service.verify_refresh_token_and_get_row", lambda db: token_service.verify_refresh_token_and_get_row(
+            db, data["refresh_token"])),
+        Scenario("token_service.rotate_refresh_token", lambda db: token_service.rotate_refresh_token(
+            db, data["refresh_token"])),
+        Scenario("token_service.rotate_refresh_token (replay)", lambda db: token_service.rotate_refresh_token(
+            db, data["refresh_token"])),
+        Scenario("token_service.revoke_refresh_token", lambda db: token_service.revoke_refresh_token(
+            db, state["issued"].token)),
+        Scenario("session_service.revoke_session", lambda db: session_service.revoke_session(
+            db, data["session_id"], owner_id=uid)),
+        Scenario("session_service.evict_excess_sessions", lambda db: session_service.evict_excess_sessions(db, uid, keep=1)),
+        Scenario("token_service.revoke_all_refresh_tokens_for_user", lambda db: token_service.revoke_all_refresh_tokens_for_user(
+            db, other)),
+        Scenario("session_service.revoke_all_sessions", lambda db: session_service.revoke_all_sessions(db, uid)),
+        Scenario("token_service.revoke_access_token_jti", lambda db: token_service.revoke_access_token_jti(
+            db, f"plan-jti-new-{tag}")),
+        Scenario("token_service.is_access_token_revoked", lambda db: token_service.is_access_token_revoked(db, "plan-jti-1")),
+
+        Scenario("revocation_feed.read_feed", lambda db: revocation_feed.read_feed(db, limit=100)),
+        Scenario("revocation_feed.purge_expired", revocation_feed.purge_expired),
+        Scenario("revocation_cache.RevocationCache.refresh (full reload)", cache.refresh),
+        Scenario("revocation_cache.RevocationCache.refresh (incremental)", cache.refresh),
+
+        Scenario("audit_service.query_logs", lambda db: audit_service.query_logs(db, user_id=uid, limit=50)),
+        Scenario("audit_service.log_action", lambda db: audit_service.log_action(
+            db, uid, AuditAction.LOGIN_SUCCESS, ip_address="10.0.0.1")),
+        Scenario("audit_service.AuditWriter.run (batch insert)", audit_batch),
+
+        Scenario("user_service.hard_delete_user", lambda db: user_service.hard_delete_user(db, victim)),
+    ]
+
+
+async def _then(first: Awaitable[Any], then: Callable[[Any], Awaitable[Any]]) -> Any:
+    return await then(await first)
+
+
+async def _partition_parents(conn: AsyncConnection) -> Dict[str, str]:
+    # Partitions are planned under their own names (audit_logs_p202512,
+    # audit_logs_legacy, ...); map them back to the table they belong to.
+    res = await conn.execute(text(
+        "SELECT c.relname, p.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent"
+    ))
+    return dict(res.all())
+
+
+def _seq_scans(node: Dict[str, Any], parents: Dict[str, str]) -> Iterator[str]:
+    if node.get("Node Type") == "Seq Scan":
+        relation = node.get("Relation Name", "")
+        relation = parents.get(relation, relation)
+        if relation in HOT_TABLES:
+            yield relation
+    for child in node.get("Plans", ()):
+        yield from _seq_scans(child, parents)
+
+
+async def _check_plans(conn: AsyncConnection, db: AsyncSession) -> List[str]:
+    data = await _seed(conn, db)
+    parents = await _partition_parents(conn)
+    failures = []
+
+    for scenario in _scenarios(data):
+        with count_statements() as counter:
+            try:
+                await scenario.call(db)
+            except ValueError:
+                pass  # Rejections (e.g. a replayed token) still ran their queries.
+            await db.flush()
+
+        allowed, _ = ALLOWED_SEQ_SCANS.get(scenario.name, (frozenset(), ""))
+        for statement, parameters in zip(counter.statements, counter.parameters):
+            if not statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")):
+                continue
+            res = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = res.scalar_one()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            scans = sorted(set(_seq_scans(plan[0]["Plan"], parents)) - allowed)
+            if scans:
+                first_line = " ".join(statement.split())[:120]
+                failures.append(f"{scenario.name}: Seq Scan on {', '.join(scans)}\n    {first_line}")
+    return failures
+
+
+@requires_db
+def test_service_queries_use_indexes(in_rollback):
+    failures = in_rollback(_check_plans)
+    assert not failures, "sequential scans on hot tables:\n" + "\n".join(failures)
+
+
+def _public_async_functions() -> Set[str]:
+    names = set()
+    for info in pkgutil.iter_modules(app.services.__path__):
+        module = importlib.import_module(f"app.services.{info.name}")
+        for name, obj in vars(module).items():
+            if name.startswith("_") or getattr(obj, "__module__", None) != module.__name__:
+                continue
+            if inspect.iscoroutinefunction(obj):
+                names.add(f"{info.name}.{name}")
+            elif inspect.isclass(obj):
+                for method_name, method in vars(obj).items():
+                    if not method_name.startswith("_") and inspect.iscoroutinefunction(method):
+                        names.add(f"{info.name}.{name}.{method_name}")
+    return names
+
+
+def test_every_service_query_has_a_scenario():
+    data = {key: 0 for key in (
+        "user_id", "other_user_id", "victim_id", "email", "refresh_token", "refresh_token_id", "session_id", "role_id",
+    )}
+    covered = {scenario.covers for scenario in _scenarios(data)}
+    missing = sorted(_public_async_functions() - covered - set(NOT_QUERIED))
+    assert not missing, f"add a scenario to tests/test_query_plans.py (or a NOT_QUERIED reason) for: {missing}"
+
+    stale = sorted((covered | set(NOT_QUERIED)) - _public_async_functions())
+    assert not stale, f"scenarios or NOT_QUERIED entries for functions that no longer exist: {stale}"
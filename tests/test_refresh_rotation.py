@@ -0,0 +1,21 @@
+from app.db.instrumentation import count_statements
+from app.services import token_service
+
+from tests.conftest import requires_db, seed_user
+
+
+@requires_db
+def test_rotate_refresh_token_sends_one_statement(in_rollback):
+    async def test(conn, db):
+        user = await seed_user(db, "rotate-budget@example.com")
+        issued = await token_service.create_refresh_token_with_session(db, user)
+
+        with count_statements() as counter:
+            rotated = await token_service.rotate_refresh_token(db, issued.token)
+
+        assert counter.count <= 1, counter.statements
+        assert rotated.user.id == user.id
+        assert rotated.session_id == issued.session_id
+        assert rotated.refresh_token_id != issued.refresh_token_id
+
+    in_rollback(test)